@@ -0,0 +1,36 @@
+"""token hash
+
+Revision ID: a0737ecb2103
+Revises: 18ad9fef53b8
+Create Date: 2026-10-18 09:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+import sqlmodel
+from alembic import op
+
+revision: str = "a0737ecb2103"
+down_revision: str | None = "18ad9fef53b8"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("tokens", sa.Column("token_hash", sqlmodel.AutoString(length=64), nullable=True))
+    op.execute("UPDATE tokens SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex')")
+    op.alter_column("tokens", "token_hash", nullable=False)
+    op.create_index(op.f("ix_tokens_token_hash"), "tokens", ["token_hash"], unique=False)
+    op.drop_index(op.f("ix_tokens_token"), table_name="tokens")
+    op.drop_column("tokens", "token")
+
+
+def downgrade() -> None:
+    # Encoded tokens cannot be recovered from their hash: every session is invalidated.
+    op.execute("DELETE FROM tokens")
+    op.add_column("tokens", sa.Column("token", sqlmodel.AutoString(), nullable=False))
+    op.create_index(op.f("ix_tokens_token"), "tokens", ["token"], unique=False)
+    op.drop_index(op.f("ix_tokens_token_hash"), table_name="tokens")
+    op.drop_column("tokens", "token_hash")
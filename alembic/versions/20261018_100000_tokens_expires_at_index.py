@@ -0,0 +1,24 @@
+"""tokens expires_at index
+
+Revision ID: 5c1e9b7f0d42
+Revises: a0737ecb2103
+Create Date: 2026-10-18 10:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "5c1e9b7f0d42"
+down_revision: str | None = "a0737ecb2103"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f("ix_tokens_expires_at"), "tokens", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_tokens_expires_at"), table_name="tokens")
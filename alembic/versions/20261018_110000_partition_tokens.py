@@ -0,0 +1,80 @@
+"""partition tokens
+
+Converts `tokens` into a table range-partitioned by `expires_at` when `TOKEN_PARTITION_INTERVAL`
+is `daily` or `weekly`, and does nothing when it is `none`. Upgrade and downgrade must run with
+the same setting. Expired tokens are not copied over.
+
+Revision ID: 7d2b4e8a9c31
+Revises: 5c1e9b7f0d42
+Create Date: 2026-10-18 11:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+
+from alembic import op
+
+from fastauth.common.settings import settings
+from fastauth.db.partitioning import PartitionInterval, create_partition_sql, partition_step, partitions_to_create
+
+revision: str = "7d2b4e8a9c31"
+down_revision: str | None = "5c1e9b7f0d42"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS = "id, token_hash, token_type, expires_at, revoked, created_at, user_id"
+
+
+def _create_tokens_table(partitioned: bool) -> None:
+    primary_key = "PRIMARY KEY (id, expires_at)" if partitioned else "PRIMARY KEY (id)"
+    partition_clause = " PARTITION BY RANGE (expires_at)" if partitioned else ""
+    op.execute(
+        f"""
+        CREATE TABLE tokens (
+            id INTEGER NOT NULL DEFAULT nextval('tokens_id_seq'),
+            token_hash VARCHAR(64) NOT NULL,
+            token_type tokentype NOT NULL,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            revoked BOOLEAN NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            user_id UUID NOT NULL,
+            CONSTRAINT tokens_pkey {primary_key},
+            CONSTRAINT tokens_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ){partition_clause}
+        """
+    )
+
+
+def _swap_tokens_table(partition_interval: PartitionInterval | None) -> None:
+    op.execute("ALTER TABLE tokens RENAME TO tokens_previous")
+    op.execute("ALTER INDEX ix_tokens_token_hash RENAME TO ix_tokens_previous_token_hash")
+    op.execute("ALTER INDEX ix_tokens_expires_at RENAME TO ix_tokens_previous_expires_at")
+    op.execute("ALTER TABLE tokens_previous RENAME CONSTRAINT tokens_pkey TO tokens_previous_pkey")
+    op.execute("ALTER TABLE tokens_previous RENAME CONSTRAINT tokens_user_id_fkey TO tokens_previous_user_id_fkey")
+    op.execute("ALTER SEQUENCE tokens_id_seq OWNED BY NONE")
+
+    _create_tokens_table(partitioned=partition_interval is not None)
+    op.create_index(op.f("ix_tokens_token_hash"), "tokens", ["token_hash"], unique=False)
+    op.create_index(op.f("ix_tokens_expires_at"), "tokens", ["expires_at"], unique=False)
+
+    if partition_interval is not None:
+        horizon = timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
+        horizon += partition_step(partition_interval) * settings.TOKEN_PARTITION_PREMAKE
+        for start in partitions_to_create(datetime.now(UTC).date(), horizon, partition_interval):
+            op.execute(create_partition_sql(start, partition_interval))
+
+    op.execute(f"INSERT INTO tokens ({COLUMNS}) SELECT {COLUMNS} FROM tokens_previous WHERE expires_at >= now()")
+    op.execute("DROP TABLE tokens_previous")
+    op.execute("ALTER SEQUENCE tokens_id_seq OWNED BY tokens.id")
+
+
+def upgrade() -> None:
+    partition_interval = settings.TOKEN_PARTITION_INTERVAL
+    if partition_interval != "none":
+        _swap_tokens_table(partition_interval=partition_interval)
+
+
+def downgrade() -> None:
+    if settings.TOKEN_PARTITION_INTERVAL != "none":
+        _swap_tokens_table(partition_interval=None)
@@ -0,0 +1,37 @@
+"""rate limit counters
+
+Revision ID: 3f6a1c9d2e58
+Revises: 7d2b4e8a9c31
+Create Date: 2026-10-18 12:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "3f6a1c9d2e58"
+down_revision: str | None = "7d2b4e8a9c31"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Counters are disposable: an unlogged table skips the WAL on every hit
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE rate_limit_counters (
+            key TEXT NOT NULL,
+            window_start BIGINT NOT NULL,
+            count INTEGER NOT NULL,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (key, window_start)
+        )
+        """
+    )
+    op.create_index(op.f("ix_rate_limit_counters_expires_at"), "rate_limit_counters", ["expires_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_rate_limit_counters_expires_at"), table_name="rate_limit_counters")
+    op.drop_table("rate_limit_counters")
@@ -0,0 +1,27 @@
+"""users oauth identity index
+
+Unique index on `users (oauth_provider, oauth_id)`, the lookup key of OAuth logins. Rows without an
+OAuth identity hold NULLs, which never conflict.
+
+Revision ID: 9b4e2f7a1c63
+Revises: 3f6a1c9d2e58
+Create Date: 2026-10-18 13:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "9b4e2f7a1c63"
+down_revision: str | None = "3f6a1c9d2e58"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f("ix_users_oauth_provider_oauth_id"), "users", ["oauth_provider", "oauth_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_users_oauth_provider_oauth_id"), table_name="users")
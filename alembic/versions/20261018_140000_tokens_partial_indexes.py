@@ -0,0 +1,82 @@
+"""tokens partial indexes
+
+Partial indexes for the queries that filter on `revoked`: `(user_id) WHERE revoked IS false` for
+logout, and `(id) WHERE revoked IS true` for the reaper. They are built with `CREATE INDEX
+CONCURRENTLY` so writes to `tokens` are not blocked. Postgres cannot build an index concurrently on
+a partitioned table. In that case the index is created on the parent only, built concurrently on each
+partition and attached. Partitions created later get it automatically.
+
+Offline (`alembic upgrade head --sql`) the partitions are unknown: `TOKEN_PARTITION_INTERVAL` tells
+whether `tokens` is partitioned, as in `7d2b4e8a9c31`, and on a partitioned table the index is
+created on the parent, which builds it on every partition without `CONCURRENTLY`.
+
+Revision ID: 4a8d1e6b3f27
+Revises: 9b4e2f7a1c63
+Create Date: 2026-10-18 14:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import context, op
+from sqlalchemy import text
+
+from fastauth.common.settings import settings
+
+revision: str = "4a8d1e6b3f27"
+down_revision: str | None = "9b4e2f7a1c63"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+INDEXES = {
+    "ix_tokens_user_id_live": ("user_id", "revoked IS false"),
+    "ix_tokens_id_revoked": ("id", "revoked IS true"),
+}
+
+
+def _is_partitioned() -> bool:
+    if context.is_offline_mode():
+        return settings.TOKEN_PARTITION_INTERVAL != "none"
+
+    statement = text("SELECT EXISTS (SELECT FROM pg_partitioned_table WHERE partrelid = 'tokens'::regclass)")
+    return op.get_bind().execute(statement).scalar_one()
+
+
+def _partitions() -> list[str] | None:
+    """Partitions of `tokens`, None when it is a plain table."""
+    if not _is_partitioned():
+        return None
+
+    bind = op.get_bind()
+    statement = text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'tokens'::regclass")
+    return list(bind.execute(statement).scalars())
+
+
+def upgrade() -> None:
+    if context.is_offline_mode() and _is_partitioned():
+        for name, (column, predicate) in INDEXES.items():
+            op.execute(f"CREATE INDEX {name} ON tokens ({column}) WHERE {predicate}")
+        return
+
+    partitions = _partitions()
+
+    with op.get_context().autocommit_block():
+        for name, (column, predicate) in INDEXES.items():
+            if partitions is None:
+                op.execute(f"CREATE INDEX CONCURRENTLY {name} ON tokens ({column}) WHERE {predicate}")
+                continue
+
+            op.execute(f"CREATE INDEX {name} ON ONLY tokens ({column}) WHERE {predicate}")
+            for partition in partitions:
+                partition_index = f"{partition}_{name.removeprefix('ix_tokens_')}"
+                op.execute(f"CREATE INDEX CONCURRENTLY {partition_index} ON {partition} ({column}) WHERE {predicate}")
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def downgrade() -> None:
+    partitioned = _is_partitioned()
+
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            # Dropping the parent index of a partitioned table drops the partition indexes with it
+            op.execute(f"DROP INDEX {name}" if partitioned else f"DROP INDEX CONCURRENTLY {name}")
@@ -0,0 +1,28 @@
+"""users token epoch
+
+`users.token_epoch`, embedded in access tokens and bumped on logout when
+`ACCESS_TOKEN_REVOCATION=epoch`. The constant default makes adding the column a catalog-only change.
+
+Revision ID: c2d7e9a4b815
+Revises: 4a8d1e6b3f27
+Create Date: 2026-10-18 15:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "c2d7e9a4b815"
+down_revision: str | None = "4a8d1e6b3f27"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("token_epoch", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_epoch")
@@ -0,0 +1,50 @@
+"""tokentype enum names
+
+`Token.token_type` stores the `TokenType` member names (`ACCESS`, `REFRESH`), which is what
+`create_all` gave the `tokentype` enum, but the init migration created it with the values
+(`access`, `refresh`), so every token insert failed on a schema built by Alembic. The labels are
+renamed in place, only where they are lowercase, so schemas built by `create_all` are left as is.
+
+Revision ID: e5f1a3c7d920
+Revises: c2d7e9a4b815
+Create Date: 2026-10-18 16:00:00.000000+00:00
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+revision: str = "e5f1a3c7d920"
+down_revision: str | None = "c2d7e9a4b815"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+LABELS = {"access": "ACCESS", "refresh": "REFRESH"}
+
+
+def _rename_labels(renames: dict[str, str]) -> None:
+    # A DO block rather than a catalog query from Python, so that `alembic upgrade head --sql` works
+    for old, new in renames.items():
+        op.execute(
+            f"""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT FROM pg_enum
+                    WHERE enumtypid = 'tokentype'::regtype AND enumlabel = '{old}'
+                ) THEN
+                    ALTER TYPE tokentype RENAME VALUE '{old}' TO '{new}';
+                END IF;
+            END
+            $$
+            """
+        )
+
+
+def upgrade() -> None:
+    _rename_labels(LABELS)
+
+
+def downgrade() -> None:
+    _rename_labels({new: old for old, new in LABELS.items()})
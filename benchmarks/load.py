@@ -0,0 +1,245 @@
+"""Drive a weighted mix of the auth endpoints at a fixed concurrency and report latency per endpoint.
+
+By default the app runs in-process over `httpx.ASGITransport` on a scratch aiosqlite database, like
+the test suite but in a temporary file, as concurrent sessions cannot share an in-memory one.
+`--url` points the in-process app at another database (a local Postgres), and `--base-url`
+targets a running server instead. Each worker owns one user, registered before the measured run,
+so refresh rotation and logout never race between workers. In-process runs also sample event loop
+lag, which is where blocking work such as bcrypt on the loop shows up.
+
+    uv run python -m benchmarks.load --concurrency 32 --duration 30 --mix me=8,refresh=1,login=1
+    uv run python -m benchmarks.load --url postgresql://postgres@localhost:5432/fastauth
+    uv run python -m benchmarks.load --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import uuid4
+
+from httpx import ASGITransport, AsyncClient, Response
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel
+
+from fastauth.common.rate_limit import limiter
+from fastauth.common.settings import settings
+from fastauth.db.database import _build_async_uri, get_async_session_factory
+from fastauth.main import app
+
+ENDPOINTS = ("register", "login", "me", "refresh", "logout")
+DEFAULT_MIX = "login=1,me=8,refresh=1"
+PASSWORD = "benchmark-password"
+AUTH_PREFIX = f"{settings.API_PREFIX}/auth"
+
+
+@dataclass
+class BenchmarkUser:
+    username: str
+    access_token: str = ""
+    refresh_token: str = ""
+
+
+@dataclass
+class Samples:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, endpoint: str, started: float, response: Response) -> None:
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if response.is_error:
+            self.errors[endpoint] += 1
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}, expected one of {', '.join(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+
+    return weights
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value, "max": value}
+
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98], "max": max(values)}
+
+
+def _store_tokens(user: BenchmarkUser, response: Response) -> None:
+    if response.is_success:
+        body = response.json()
+        user.access_token = body["access_token"]
+        user.refresh_token = body["refresh_token"]
+
+
+async def _register(client: AsyncClient, samples: Samples | None = None) -> BenchmarkUser:
+    user = BenchmarkUser(username=f"bench_{uuid4().hex[:16]}")
+    started = time.perf_counter()
+    response = await client.post(
+        f"{AUTH_PREFIX}/register",
+        json={"email": f"{user.username}@example.com", "username": user.username, "password": PASSWORD},
+    )
+    if samples is not None:
+        samples.record("register", started, response)
+
+    _store_tokens(user, response)
+    return user
+
+
+async def _call(client: AsyncClient, endpoint: str, user: BenchmarkUser, samples: Samples) -> None:
+    if endpoint == "register":
+        await _register(client, samples)
+        return
+
+    started = time.perf_counter()
+    if endpoint == "login":
+        response = await client.post(f"{AUTH_PREFIX}/login", data={"username": user.username, "password": PASSWORD})
+        samples.record(endpoint, started, response)
+        _store_tokens(user, response)
+    elif endpoint == "me":
+        response = await client.get(f"{AUTH_PREFIX}/me", headers={"Authorization": f"Bearer {user.access_token}"})
+        samples.record(endpoint, started, response)
+    elif endpoint == "refresh":
+        response = await client.get(f"{AUTH_PREFIX}/refresh", headers={"Authorization": f"Bearer {user.refresh_token}"})
+        samples.record(endpoint, started, response)
+        _store_tokens(user, response)
+    else:
+        response = await client.post(f"{AUTH_PREFIX}/logout", headers={"Authorization": f"Bearer {user.access_token}"})
+        samples.record(endpoint, started, response)
+        # Tokens are revoked, log back in so the worker can keep going
+        await _call(client, "login", user, samples)
+
+
+async def _worker(
+    client: AsyncClient,
+    user: BenchmarkUser,
+    weights: dict[str, float],
+    samples: Samples,
+    deadline: float,
+    budget: list[int],
+) -> None:
+    endpoints, endpoint_weights = list(weights), list(weights.values())
+    while time.perf_counter() < deadline and budget[0] > 0:
+        budget[0] -= 1
+        endpoint = random.choices(endpoints, weights=endpoint_weights)[0]
+        await _call(client, endpoint, user, samples)
+
+
+async def _monitor_loop_lag(lags: list[float], interval: float = 0.01) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(time.perf_counter() - started - interval, 0.0) * 1000)
+
+
+async def _drive(
+    client: AsyncClient, concurrency: int, duration: float, requests: int, weights: dict[str, float]
+) -> dict[str, Any]:
+    # Registration is admission controlled, stay within its concurrency budget
+    registering = asyncio.Semaphore(settings.ADMISSION_REGISTER_MAX_CONCURRENCY)
+
+    async def register() -> BenchmarkUser:
+        async with registering:
+            return await _register(client)
+
+    users = await asyncio.gather(*(register() for _ in range(concurrency)))
+    if not all(user.access_token for user in users):
+        raise RuntimeError("Registering the benchmark users failed")
+
+    samples = Samples()
+    lags: list[float] = []
+    lag_monitor = asyncio.create_task(_monitor_loop_lag(lags))
+    budget = [requests]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(client, user, weights, samples, started + duration, budget) for user in users))
+    elapsed = time.perf_counter() - started
+    lag_monitor.cancel()
+
+    endpoints = {
+        name: {
+            "requests": len(latencies),
+            "errors": samples.errors[name],
+            "throughput_rps": len(latencies) / elapsed,
+            "latency_ms": _percentiles(latencies),
+        }
+        for name, latencies in sorted(samples.latencies.items())
+    }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+
+    return {
+        "concurrency": concurrency,
+        "mix": weights,
+        "elapsed_s": elapsed,
+        "requests": total,
+        "throughput_rps": total / elapsed,
+        "event_loop_lag_ms": _percentiles(lags),
+        "endpoints": endpoints,
+    }
+
+
+async def _in_process_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(_build_async_uri(url))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    return engine
+
+
+async def run(
+    url: str, base_url: str | None, concurrency: int, duration: float, requests: int, weights: dict[str, float]
+) -> dict[str, Any]:
+    if base_url is not None:
+        async with AsyncClient(base_url=base_url, timeout=None) as client:
+            results = await _drive(client, concurrency, duration, requests, weights)
+        # Lag of the benchmark's own loop says nothing about the server
+        results.pop("event_loop_lag_ms")
+        return {"target": base_url, **results}
+
+    # Registration and login limits are per client address, and every in-process request shares one
+    limiter.enabled = False
+    engine = await _in_process_engine(url)
+    app.state.engine = engine
+    app.state.async_session_factory = get_async_session_factory(engine)
+
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+            results = await _drive(client, concurrency, duration, requests, weights)
+    finally:
+        await engine.dispose()
+
+    return {"target": engine.url.render_as_string(hide_password=True), **results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="database of the in-process app, a scratch sqlite file by default")
+    target.add_argument("--base-url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--requests", type=int, default=1_000_000, help="stop after this many requests")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="comma-separated endpoint=weight pairs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        url = args.url or f"sqlite+aiosqlite:///{scratch}/benchmark.db"
+        results = asyncio.run(run(url, args.base_url, args.concurrency, args.duration, args.requests, args.mix))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
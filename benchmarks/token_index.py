@@ -0,0 +1,116 @@
+"""Compare index size and lookup latency of full-JWT keys against SHA-256 keys on Postgres.
+
+Builds two scratch tables with the same number of rows, one keyed by a JWT-sized string and one
+by its SHA-256 hex digest, then reports the size of each index and the latency of random
+equality lookups as JSON.
+
+    uv run python -m benchmarks.token_index --url postgresql://postgres@localhost:5432/fastauth --rows 10000000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from fastauth.common.settings import settings
+from fastauth.db.database import _build_async_uri
+
+# Stand-in for an encoded JWT: header, payload and signature segments of realistic length
+FAKE_JWT_SQL = (
+    "'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.' || "
+    "encode(convert_to(md5(i::text) || md5((i + 1)::text) || md5((i + 2)::text) || md5((i + 3)::text), 'UTF8'), "
+    "'base64') || '.' || md5((i * 7)::text)"
+)
+
+TABLES = {
+    "jwt": ("bench_tokens_jwt", "token", f"replace({FAKE_JWT_SQL}, E'\\n', '')"),
+    "sha256": (
+        "bench_tokens_sha256",
+        "token_hash",
+        f"encode(sha256(convert_to(replace({FAKE_JWT_SQL}, E'\\n', ''), 'UTF8')), 'hex')",
+    ),
+}
+
+
+async def _build_table(conn: AsyncConnection, table: str, column: str, expression: str, rows: int) -> None:
+    await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    await conn.execute(text(f"CREATE TABLE {table} (id bigint PRIMARY KEY, {column} varchar NOT NULL)"))
+    await conn.execute(
+        text(f"INSERT INTO {table} (id, {column}) SELECT i, {expression} FROM generate_series(1, :rows) AS i"),
+        {"rows": rows},
+    )
+    await conn.execute(text(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})"))
+    await conn.execute(text(f"ANALYZE {table}"))
+
+
+async def _measure(conn: AsyncConnection, table: str, column: str, rows: int, lookups: int) -> dict[str, Any]:
+    sizes = (
+        await conn.execute(
+            text(
+                "SELECT pg_relation_size(:table), pg_relation_size(:index), "
+                f"(SELECT avg(octet_length({column})) FROM {table})"
+            ),
+            {"table": table, "index": f"ix_{table}_{column}"},
+        )
+    ).one()
+
+    ids = [random.randint(1, rows) for _ in range(lookups)]
+    keys = (
+        (await conn.execute(text(f"SELECT {column} FROM {table} WHERE id = ANY(:ids)"), {"ids": ids})).scalars().all()
+    )
+
+    latencies = []
+    statement = text(f"SELECT id FROM {table} WHERE {column} = :key")
+    for key in keys:
+        started = time.perf_counter()
+        await conn.execute(statement, {"key": key})
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "table_bytes": sizes[0],
+        "index_bytes": sizes[1],
+        "avg_key_bytes": float(sizes[2]),
+        "lookup_ms": {"p50": quantiles[49], "p95": quantiles[94], "p99": quantiles[98]},
+    }
+
+
+async def run(url: str, rows: int, lookups: int, keep: bool) -> dict[str, Any]:
+    engine = create_async_engine(_build_async_uri(url))
+    results: dict[str, Any] = {"rows": rows, "lookups": lookups}
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for name, (table, column, expression) in TABLES.items():
+                await _build_table(conn, table, column, expression, rows)
+                results[name] = await _measure(conn, table, column, rows, lookups)
+
+            if not keep:
+                for table, _, _ in TABLES.values():
+                    await conn.execute(text(f"DROP TABLE {table}"))
+    finally:
+        await engine.dispose()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.FASTAUTH_POSTGRES_POOLER_CONNECTION_STRING)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=5_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch tables after the run")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.url, args.rows, args.lookups, args.keep)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
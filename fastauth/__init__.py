@@ -0,0 +1,4 @@
+import time
+
+# Start of the import of the application, before any of its dependencies, see fastauth.common.startup
+IMPORT_STARTED = time.perf_counter()
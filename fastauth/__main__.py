@@ -0,0 +1,3 @@
+from fastauth.cli import main
+
+main()
@@ -0,0 +1,320 @@
+"""Command line entry point: `python -m fastauth serve` and `python -m fastauth import-report`.
+
+`serve` imports the application and, with `PASSWORD_HASH_TARGET_MS`, calibrates password hashing
+once, then forks `--workers` uvicorn processes sharing one listening socket, so the work done
+before the fork is shared copy-on-write instead of repeated by every worker. The parent only
+supervises: it restarts a worker that dies, and forwards SIGTERM and SIGINT so that workers finish
+their requests before exiting.
+
+With `METRICS_ENABLED`, the workers write their metrics to files in `PROMETHEUS_MULTIPROC_DIR`
+(a temporary directory when unset), so that each `/metrics` scrape reports all of them.
+Everything else stays per worker: its database pool (a share of `DB_CONNECTION_BUDGET`), the
+in-memory rate limit counters (use `RATE_LIMIT_STORAGE=shared-memory` to share them) and the token
+cache.
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from types import FrameType
+
+from fastauth.common.settings import settings
+
+logger = logging.getLogger("fastauth.cli")
+
+# A worker exiting sooner than this after its start is failing to boot, restarting it would spin
+MIN_WORKER_UPTIME_SECONDS = 5.0
+
+
+def cpu_quota(cgroup_root: str = "/sys/fs/cgroup") -> int | None:
+    """Whole CPUs allowed by the cgroup v2 CPU quota of this process, at least 1, None without a quota."""
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        return None
+
+    if quota == "max":
+        return None
+
+    return max(1, int(quota) // int(period))
+
+
+def default_workers() -> int:
+    """Available CPUs, capped by the container CPU quota that `os.process_cpu_count` does not see."""
+    cpus = os.process_cpu_count() or 1
+    quota = cpu_quota()
+    return min(cpus, quota) if quota is not None else cpus
+
+
+def split_pool_budget(budget: int, workers: int, reserved: int = 0) -> tuple[int, int]:
+    """Pool size and overflow of each worker, so that all workers together open at most `budget` connections.
+
+    `reserved` connections of each worker are opened outside its pool, such as the one of the postgres
+    rate limit storage. The token reaper, the partition maintenance and the warm-up check their
+    connections out of the pool. The budget is per database server: with a read replica, the replica
+    pool gets the same size, so each of the primary and the replica receives at most `budget`.
+    """
+    pool_size = budget // workers - reserved
+    if pool_size < 1:
+        raise ValueError(
+            f"A budget of {budget} database connections cannot serve {workers} workers "
+            f"with {reserved} connection(s) each outside the pool"
+        )
+
+    return pool_size, 0
+
+
+def _prepare_metrics_dir() -> tuple[str, bool]:
+    """Empty `PROMETHEUS_MULTIPROC_DIR`, or a new temporary directory when unset, and whether it was created.
+
+    Must run before `prometheus_client` is imported, it picks the multiprocess mode at import.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    created = not path
+    if not path:
+        path = tempfile.mkdtemp(prefix="fastauth-metrics-")
+
+    os.makedirs(path, exist_ok=True)
+    # Files left by a previous run would be summed with the counters of this one
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path, created
+
+
+def _preload() -> None:
+    """Import the application and calibrate password hashing, if enabled, once before the workers fork."""
+    from fastauth.main import app
+    from fastauth.services.password import build_context, calibrate_cost, password_hasher
+
+    if settings.PASSWORD_HASH_TARGET_MS is not None:
+        argon2_parameters = {
+            "argon2_memory_cost": settings.PASSWORD_HASH_ARGON2_MEMORY_KIB,
+            "argon2_parallelism": settings.PASSWORD_HASH_ARGON2_PARALLELISM,
+        }
+        cost = calibrate_cost(
+            settings.PASSWORD_HASH_SCHEME,
+            settings.PASSWORD_HASH_TARGET_MS / 1000,
+            min_cost=settings.PASSWORD_HASH_COST,
+            **argon2_parameters,
+        )
+        password_hasher.configure(build_context(settings.PASSWORD_HASH_SCHEME, cost, **argon2_parameters))
+        # Workers keep this cost instead of calibrating again, concurrently, in their lifespan
+        settings.PASSWORD_HASH_COST = cost
+        settings.PASSWORD_HASH_TARGET_MS = None
+
+    app.openapi()
+
+
+class Supervisor:
+    """Forks the workers, restarts the ones that die and stops them all on SIGTERM or SIGINT."""
+
+    def __init__(
+        self,
+        sock: socket.socket,
+        workers: int,
+        timeout_graceful_shutdown: int,
+        metrics_dir: str | None = None,
+    ) -> None:
+        self.sock = sock
+        self.workers = workers
+        self.timeout_graceful_shutdown = timeout_graceful_shutdown
+        self.metrics_dir = metrics_dir
+        self.children: dict[int, float] = {}
+        self.stopping = False
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        # In the worker: uvicorn installs its own signal handlers and shuts down gracefully
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            _serve(self.sock, self.timeout_graceful_shutdown)
+        except BaseException:
+            logger.exception("Worker %s crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _stop(self, signum: int, _frame: FrameType | None) -> None:
+        self.stopping = True
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM if signum == signal.SIGINT else signum)
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+
+        exit_code = 0
+        while self.children:
+            pid, status = os.wait()
+            started = self.children.pop(pid, None)
+            if started is not None and self.metrics_dir is not None:
+                from prometheus_client import multiprocess
+
+                multiprocess.mark_process_dead(pid, self.metrics_dir)
+            if started is None or self.stopping:
+                continue
+
+            logger.warning("Worker %s exited with status %s", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+                logger.error("Worker %s failed to start, stopping", pid)
+                exit_code = 1
+                self._stop(signal.SIGTERM, None)
+                continue
+
+            self._spawn()
+
+        return exit_code
+
+
+def _serve(sock: socket.socket, timeout_graceful_shutdown: int) -> None:
+    import uvicorn
+
+    from fastauth.main import app
+
+    config = uvicorn.Config(app, timeout_graceful_shutdown=timeout_graceful_shutdown)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(args: argparse.Namespace) -> int:
+    workers = args.workers or default_workers()
+    budget = args.db_connection_budget
+    if budget is not None:
+        # The postgres rate limit storage keeps one psycopg connection per worker
+        reserved = 1 if settings.RATE_LIMIT_STORAGE == "postgres" else 0
+        settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW = split_pool_budget(budget, workers, reserved)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    # httpx logs every request at INFO, those of the warm-up and of the OAuth flows included
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    metrics_dir, created_metrics_dir = None, False
+    if settings.METRICS_ENABLED and workers > 1:
+        metrics_dir, created_metrics_dir = _prepare_metrics_dir()
+    _preload()
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    sock.set_inheritable(True)
+    logger.info(
+        "Serving on http://%s:%s with %s workers, %s+%s database connections each",
+        args.host,
+        args.port,
+        workers,
+        settings.DB_POOL_SIZE,
+        settings.DB_MAX_OVERFLOW,
+    )
+
+    try:
+        return Supervisor(sock, workers, args.timeout_graceful_shutdown, metrics_dir).run()
+    finally:
+        sock.close()
+        if created_metrics_dir and metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def parse_import_times(output: str, module: str) -> tuple[float, list[tuple[str, float]]]:
+    """Import time of `module` and of each of its direct imports, in seconds, from `python -X importtime` output.
+
+    The output lists every module after the modules it imports, indented one level deeper.
+    """
+    children: list[tuple[str, float]] = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+
+        _self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        if depth == 1:
+            children.append((name, int(cumulative_us) / 1_000_000))
+        elif depth == 0:
+            if name == module:
+                return int(cumulative_us) / 1_000_000, sorted(children, key=lambda child: child[1], reverse=True)
+            children = []
+
+    raise ValueError(f"No import time of {module} in the output")
+
+
+def import_report(args: argparse.Namespace) -> int:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, children = parse_import_times(result.stderr, args.module)
+
+    if args.json:
+        print(json.dumps({"module": args.module, "seconds": total, "imports": dict(children)}))
+    else:
+        print(f"{args.module}: {total * 1000:.0f} ms")
+        for name, seconds in children[: args.top]:
+            print(f"  {seconds * 1000:8.1f} ms  {name}")
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="fastauth")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the API with several worker processes")
+    serve_parser.add_argument("--host", default=settings.SERVER_HOST)
+    serve_parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVER_WORKERS,
+        help="worker processes, the available CPUs within the cgroup CPU quota by default",
+    )
+    serve_parser.add_argument(
+        "--db-connection-budget",
+        type=int,
+        default=settings.DB_CONNECTION_BUDGET,
+        help="database connections of all workers together, per database server, "
+        "DB_POOL_SIZE and DB_MAX_OVERFLOW per worker otherwise",
+    )
+    serve_parser.add_argument(
+        "--timeout-graceful-shutdown",
+        type=int,
+        default=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        help="seconds a stopping worker waits for its requests to finish",
+    )
+    serve_parser.set_defaults(handler=serve)
+
+    report_parser = commands.add_parser(
+        "import-report", help="time the import of the application in a fresh interpreter, by module"
+    )
+    report_parser.add_argument("--module", default="fastauth.main")
+    report_parser.add_argument("--top", type=int, default=15, help="direct imports listed, slowest first")
+    report_parser.add_argument("--json", action="store_true", help="print every direct import as one JSON object")
+    report_parser.set_defaults(handler=import_report)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    sys.exit(args.handler(args))
@@ -0,0 +1,92 @@
+"""Per-route admission control, so a burst on the CPU-heavy routes cannot starve the cheap ones.
+
+`/login` and `/register` hash passwords: each gets its own budget of concurrent requests, plus a short
+queue. A request beyond both, or still queued after `queue_timeout` seconds, is rejected with a 503
+before it opens a database session, leaving the pool and the event loop to `/me` and `/refresh`.
+Budgets are per process.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from fastauth.common.exceptions import AdmissionRejectedException
+from fastauth.common.metrics import metrics
+from fastauth.common.settings import settings
+
+
+class AdmissionLimiter:
+    """At most `max_concurrency` requests run, at most `max_queue` more wait up to `queue_timeout` seconds."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._rejections = metrics.admission_rejections.labels(name)
+
+    def _reject(self, reason: str) -> AdmissionRejectedException:
+        self.rejected += 1
+        self._rejections.inc()
+        return AdmissionRejectedException(f"Too many {self.name} requests in progress, {reason}")
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block, raising `AdmissionRejectedException` when there is none."""
+        if self._semaphore.locked():
+            if self._queued >= self.max_queue:
+                raise self._reject("queue is full")
+
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except TimeoutError:
+                raise self._reject("timed out in queue") from None
+            finally:
+                self._queued -= 1
+        else:
+            await self._semaphore.acquire()
+
+        self._active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    async def __call__(self) -> AsyncIterator[None]:
+        """FastAPI dependency holding a slot until the response is sent."""
+        async with self.admit():
+            yield
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+        }
+
+
+login_admission = AdmissionLimiter(
+    name="login",
+    max_concurrency=settings.ADMISSION_LOGIN_MAX_CONCURRENCY,
+    max_queue=settings.ADMISSION_LOGIN_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+register_admission = AdmissionLimiter(
+    name="register",
+    max_concurrency=settings.ADMISSION_REGISTER_MAX_CONCURRENCY,
+    max_queue=settings.ADMISSION_REGISTER_MAX_QUEUE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+metrics.watch_admission([login_admission, register_admission])
@@ -23,3 +23,18 @@ class NotFoundException(DatabaseException):
     """Exception raised when we expect a result from database but we get nothing."""
 
     pass
+
+
+# Service exceptions
+
+
+class HashingUnavailableException(FastAuthException):
+    """Exception raised when the password hashing pool is saturated."""
+
+    pass
+
+
+class AdmissionRejectedException(FastAuthException):
+    """Exception raised when admission control turns a request away."""
+
+    pass
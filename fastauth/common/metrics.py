@@ -0,0 +1,323 @@
+"""Optional Prometheus metrics, enabled with `METRICS_ENABLED` and served on `/metrics`.
+
+Metrics and their label children are created once, at import or on the first use of a route or
+repository, so the hot path only updates counters. When metrics are disabled every metric is a no-op
+and repository methods are left unwrapped.
+
+Under `fastauth serve` with several workers, `PROMETHEUS_MULTIPROC_DIR` is set before the first
+metric is created: every worker writes its counters and histograms to its own file in that
+directory and a scrape, whichever worker serves it, sums them all. The pool and admission gauges
+are read at scrape time from the worker serving it, and labelled with its `pid`.
+"""
+
+import functools
+import os
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Protocol
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from fastauth.common.settings import settings
+
+if TYPE_CHECKING:
+    from prometheus_client import CollectorRegistry
+    from prometheus_client.core import Metric
+
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"))
+JWT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+
+
+class Observer(Protocol):
+    def observe(self, amount: float) -> None: ...
+
+
+class Incrementer(Protocol):
+    def inc(self, amount: float = 1) -> None: ...
+
+
+class _NoopMetric:
+    def labels(self, *_values: str) -> "_NoopMetric":
+        return self
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+NOOP = _NoopMetric()
+
+# Round trip counter of the repository method currently running, see `Metrics.repository_method`
+_current_round_trips: ContextVar[Incrementer | None] = ContextVar("current_round_trips", default=None)
+
+
+def _worker_labels() -> tuple[list[str], list[str]]:
+    """Label names and values of the scrape-time metrics, the `pid` of the worker in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        return ["pid"], [str(os.getpid())]
+
+    return [], []
+
+
+class PoolCollector:
+    """Reads pool gauges at scrape time instead of tracking every checkout, labelled by pool."""
+
+    def __init__(self) -> None:
+        self.pools: dict[str, Callable[[], dict[str, Any]]] = {}
+
+    def collect(self) -> Iterator["Metric"]:
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        if not self.pools:
+            return
+
+        statuses = {pool: status() for pool, status in self.pools.items()}
+        label_names, label_values = _worker_labels()
+
+        def family(family_class: type[Any], name: str, documentation: str, key: str) -> "Metric":
+            metric = family_class(name, documentation, labels=["pool", *label_names])
+            for pool, status in statuses.items():
+                if key in status:
+                    metric.add_metric([pool, *label_values], status[key])
+            return metric
+
+        families = [
+            family(GaugeMetricFamily, f"fastauth_db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", key)
+            for key in ("size", "checked_out", "overflow")
+        ]
+        families += [
+            family(
+                CounterMetricFamily, "fastauth_db_pool_checkouts", "Connections checked out of the pool", "checkouts"
+            ),
+            family(
+                CounterMetricFamily,
+                "fastauth_db_pool_checkout_wait_seconds",
+                "Time spent waiting for a pool connection",
+                "checkout_wait_total_seconds",
+            ),
+            family(
+                GaugeMetricFamily,
+                "fastauth_db_pool_checkout_wait_max_seconds",
+                "Longest wait for a pool connection",
+                "checkout_wait_max_seconds",
+            ),
+        ]
+        # Pools other than `InstrumentedAsyncQueuePool` have no checkout statistics
+        yield from (metric for metric in families if metric.samples)
+
+
+class AdmissionCollector:
+    """Reads the occupancy of admission limiters at scrape time."""
+
+    def __init__(self) -> None:
+        self.limiters: list[Any] = []
+
+    def collect(self) -> Iterator["Metric"]:
+        from prometheus_client.core import GaugeMetricFamily
+
+        if not self.limiters:
+            return
+
+        label_names, label_values = _worker_labels()
+        active = GaugeMetricFamily(
+            "fastauth_admission_active", "Requests holding an admission slot", labels=["group", *label_names]
+        )
+        queued = GaugeMetricFamily(
+            "fastauth_admission_queued", "Requests waiting for an admission slot", labels=["group", *label_names]
+        )
+        for limiter in self.limiters:
+            stats = limiter.stats()
+            active.add_metric([limiter.name, *label_values], stats["active"])
+            queued.add_metric([limiter.name, *label_values], stats["queued"])
+
+        yield active
+        yield queued
+
+
+class Metrics:
+    """Every metric of the service, registered on `registry`, or no-ops when `registry` is None."""
+
+    def __init__(self, registry: "CollectorRegistry | None") -> None:
+        self.registry = registry
+        self.enabled = registry is not None
+        self.pool_collector = PoolCollector()
+        self.admission_collector = AdmissionCollector()
+
+        if registry is None:
+            self.request_duration: Any = NOOP
+            self.password_hash: Observer = NOOP
+            self.password_verify: Observer = NOOP
+            self.jwt_encode: Observer = NOOP
+            self.jwt_decode: Observer = NOOP
+            self.repository_duration: Any = NOOP
+            self.repository_round_trips: Any = NOOP
+            self.rate_limit_rejections: Any = NOOP
+            self.admission_rejections: Any = NOOP
+            return
+
+        from prometheus_client import Counter, Histogram
+
+        self.request_duration = Histogram(
+            "fastauth_http_request_duration_seconds",
+            "HTTP request latency by route",
+            ["method", "route"],
+            registry=registry,
+        )
+        password_hashing = Histogram(
+            "fastauth_password_hash_duration_seconds",
+            "Password hashing latency, including the wait for a hashing worker",
+            ["operation"],
+            registry=registry,
+        )
+        self.password_hash = password_hashing.labels("hash")
+        self.password_verify = password_hashing.labels("verify")
+        jwt = Histogram(
+            "fastauth_jwt_duration_seconds",
+            "JWT encoding and decoding time",
+            ["operation"],
+            buckets=JWT_BUCKETS,
+            registry=registry,
+        )
+        self.jwt_encode = jwt.labels("encode")
+        self.jwt_decode = jwt.labels("decode")
+        self.repository_duration = Histogram(
+            "fastauth_repository_duration_seconds",
+            "Repository method latency",
+            ["repository", "method"],
+            registry=registry,
+        )
+        self.repository_round_trips = Counter(
+            "fastauth_repository_round_trips",
+            "Statements sent to the database by repository methods",
+            ["repository", "method"],
+            registry=registry,
+        )
+        self.rate_limit_rejections = Counter(
+            "fastauth_rate_limit_rejections",
+            "Requests rejected by the rate limiter",
+            ["route"],
+            registry=registry,
+        )
+        self.admission_rejections = Counter(
+            "fastauth_admission_rejections",
+            "Requests rejected by admission control",
+            ["group"],
+            registry=registry,
+        )
+        registry.register(self.pool_collector)
+        registry.register(self.admission_collector)
+
+    def render(self) -> tuple[bytes, str]:
+        """Text exposition of every metric and its content type."""
+        from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+
+        if self.registry is None:
+            raise RuntimeError("Metrics are disabled")
+
+        if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(self.pool_collector)
+        registry.register(self.admission_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    def watch_engine(
+        self, engine: AsyncEngine, pool_status: Callable[[], dict[str, Any]] | None = None, pool: str = "primary"
+    ) -> None:
+        """Count statements of repository methods on `engine` and expose its pool as `pool` through `pool_status`."""
+        if not self.enabled:
+            return
+
+        if pool_status is not None:
+            self.pool_collector.pools[pool] = pool_status
+        if not event.contains(engine.sync_engine, "after_cursor_execute", _count_round_trip):
+            event.listen(engine.sync_engine, "after_cursor_execute", _count_round_trip)
+
+    def watch_admission(self, limiters: list[Any]) -> None:
+        """Expose the active and queued requests of admission `limiters`."""
+        self.admission_collector.limiters.extend(limiters)
+
+    def repository_method[**P, R](self, method: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        """Time `method` and count its statements, labelled by the repository class it is called on."""
+        if not self.enabled:
+            return method
+
+        children: dict[type | None, tuple[Observer, Incrementer]] = {}
+        duration, round_trips = self.repository_duration, self.repository_round_trips
+        defined_in, _, name = getattr(method, "__qualname__").rpartition(".")
+
+        @functools.wraps(method)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            # Static methods get no instance, they are labelled with the class that defines them
+            owner = type(args[0]) if args and hasattr(args[0], "__model__") else None
+            bound = children.get(owner)
+            if bound is None:
+                repository = owner.__name__ if owner is not None else defined_in
+                bound = children[owner] = (duration.labels(repository, name), round_trips.labels(repository, name))
+
+            # Statements of nested repository calls count towards the outermost one
+            token = _current_round_trips.set(bound[1]) if _current_round_trips.get() is None else None
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                bound[0].observe(time.perf_counter() - started)
+                if token is not None:
+                    _current_round_trips.reset(token)
+
+        return wrapper
+
+
+def _count_round_trip(*_args: Any) -> None:
+    round_trips = _current_round_trips.get()
+    if round_trips is not None:
+        round_trips.inc()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware observing the latency of every HTTP request, labelled by matched route."""
+
+    def __init__(self, app: ASGIApp, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+        self._children: dict[str, dict[str, Observer]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched route in the scope, its path is the route template
+            path = getattr(scope.get("route"), "path", "unmatched")
+            # Any other method would create a label child per value a client sends
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+            by_method = self._children.get(path)
+            observer = by_method.get(method) if by_method is not None else None
+            if observer is None:
+                observer = self.metrics.request_duration.labels(method, path)
+                self._children.setdefault(path, {})[method] = observer
+
+            observer.observe(time.perf_counter() - started)
+
+
+def _build_metrics() -> Metrics:
+    if not settings.METRICS_ENABLED:
+        return Metrics(registry=None)
+
+    from prometheus_client import CollectorRegistry
+
+    return Metrics(registry=CollectorRegistry())
+
+
+metrics = _build_metrics()
@@ -1,4 +1,54 @@
+import asyncio
+
+from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
+from fastauth.common import rate_limit_storage  # noqa: F401  registers the fastauth+* storage schemes
+from fastauth.common.settings import settings
+
+
+def _storage_uri() -> str:
+    if settings.RATE_LIMIT_STORAGE == "shared-memory":
+        return (
+            f"fastauth+shm://{settings.RATE_LIMIT_SHARED_MEMORY_NAME}?slots={settings.RATE_LIMIT_SHARED_MEMORY_SLOTS}"
+        )
+
+    if settings.RATE_LIMIT_STORAGE == "postgres":
+        uri = settings.RATE_LIMIT_POSTGRES_CONNECTION_STRING or settings.FASTAUTH_POSTGRES_POOLER_CONNECTION_STRING
+        return "fastauth+postgresql://" + uri.split("://", 1)[1]
+
+    return "memory://"
+
+
+def _storage_options() -> dict[str, str]:
+    if settings.RATE_LIMIT_STORAGE == "postgres":
+        return {
+            "connect_timeout": str(settings.RATE_LIMIT_POSTGRES_CONNECT_TIMEOUT_SECONDS),
+            "statement_timeout_ms": str(settings.RATE_LIMIT_POSTGRES_STATEMENT_TIMEOUT_MS),
+        }
+
+    return {}
+
+
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=_storage_uri(),
+    storage_options=_storage_options(),
+    strategy="sliding-window-counter",
+    # Keep limiting per process if the shared database storage becomes unreachable
+    in_memory_fallback_enabled=settings.RATE_LIMIT_STORAGE == "postgres",
+)
+
+
+async def check_rate_limit(request: Request) -> None:
+    """Dependency checking the limits of the route in a worker thread when the storage is `postgres`.
+
+    slowapi checks them synchronously in the `limiter.limit` decorator, which would block the event loop for the
+    round trip to the database; the decorator skips its own check once the request is marked as checked.
+    """
+    if not limiter.enabled or settings.RATE_LIMIT_STORAGE != "postgres":
+        return
+
+    await asyncio.to_thread(limiter._check_request_limit, request, request.scope["endpoint"], False)
+    request.state._rate_limiting_complete = True
@@ -0,0 +1,390 @@
+"""Rate-limit storages shared between workers, registered with `limits` under their URI scheme.
+
+Both keep sliding-window counters in a fixed amount of memory: for each key, the count of the
+current window and of the previous one. The weighted count is
+`previous * (time left in the current window / window) + current`.
+
+- `fastauth+shm://<name>?slots=<n>`: a shared memory table of `n` slots, for several workers on one host.
+- `fastauth+postgresql://...`: an UPSERT per hit on the `rate_limit_counters` table, for several hosts.
+"""
+
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import UTC, datetime
+from math import floor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+
+
+def _window(now: float, expiry: int) -> tuple[int, float]:
+    """Index of the window containing `now`, and the weight of the previous window."""
+    window = int(now // expiry)
+    previous_weight = 1 - (now % expiry) / expiry
+    return window, previous_weight
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    """Sliding-window counters in a fixed-size shared memory hash table.
+
+    Every slot holds a key hash, the window length, the current window index and the current and
+    previous counts. Updates are serialized across processes by an `flock` on a lock file next to the
+    segment, opened again in each process: `flock` locks belong to the open file description, which
+    a worker forked after the storage was created would otherwise share with its siblings. When the
+    probed slots are all taken, the least recently used one is recycled, so under heavy key churn a
+    key can lose its count early (the limit errs towards allowing requests).
+    """
+
+    STORAGE_SCHEME = ["fastauth+shm"]
+
+    SLOT = struct.Struct("<QqIII4x")
+    PROBES = 8
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options: Any) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        parsed = urllib.parse.urlparse(uri)
+        query = urllib.parse.parse_qs(parsed.query)
+        self.name = parsed.netloc or "fastauth-rate-limit"
+        self.slots = int(query.get("slots", ["65536"])[0])
+        self.size = self.slots * self.SLOT.size
+
+        self._lock_pid: int | None = None
+        with self._locked():
+            try:
+                self._shm = SharedMemory(name=self.name, create=True, size=self.size, track=False)
+            except FileExistsError:
+                self._shm = SharedMemory(name=self.name, track=False)
+
+        if self._shm.buf is None or self._shm.size < self.size:
+            raise ValueError(f"Shared memory segment {self.name} is smaller than {self.slots} slots")
+        self._buf: memoryview = self._shm.buf
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return (OSError, ValueError)
+
+    def _locked(self) -> "_FileLock":
+        if self._lock_pid != os.getpid():
+            if self._lock_pid is not None:
+                self._lock_file.close()
+            self._thread_lock = threading.Lock()
+            self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{self.name}.lock"), "a+b")
+            self._lock_pid = os.getpid()
+
+        return _FileLock(self._thread_lock, self._lock_file)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    def _read(self, index: int) -> tuple[int, int, int, int, int]:
+        return self.SLOT.unpack_from(self._buf, index * self.SLOT.size)
+
+    def _write(self, index: int, key_hash: int, window: int, expiry: int, current: int, previous: int) -> None:
+        self.SLOT.pack_into(self._buf, index * self.SLOT.size, key_hash, window, expiry, current, previous)
+
+    def _probe(self, key_hash: int) -> tuple[int | None, int]:
+        """Slot holding `key_hash` if any, and the slot to claim for it otherwise."""
+        start = key_hash % self.slots
+        free = None
+        oldest, oldest_end = start, None
+
+        for probe in range(self.PROBES):
+            index = (start + probe) % self.slots
+            slot_hash, window, expiry, _, _ = self._read(index)
+            if slot_hash == key_hash:
+                return index, index
+            if slot_hash == 0 and free is None:
+                free = index
+            end = (window + 2) * expiry
+            if oldest_end is None or end < oldest_end:
+                oldest, oldest_end = index, end
+
+        return None, free if free is not None else oldest
+
+    def _find(self, key_hash: int) -> int | None:
+        return self._probe(key_hash)[0]
+
+    def _find_or_claim(self, key_hash: int) -> int:
+        found, claimable = self._probe(key_hash)
+        if found is not None:
+            return found
+
+        self._write(claimable, key_hash, 0, 0, 0, 0)
+        return claimable
+
+    def _counts(self, index: int, now: float, expiry: int) -> tuple[int, int, int, float]:
+        """Counts of `index` rolled forward to the window containing `now`."""
+        _, window, _, current, previous = self._read(index)
+        now_window, previous_weight = _window(now, expiry)
+
+        if window == now_window:
+            return now_window, current, previous, previous_weight
+        if window == now_window - 1:
+            return now_window, 0, current, previous_weight
+
+        return now_window, 0, 0, previous_weight
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+
+        key_hash = self._hash(key)
+        with self._locked():
+            index = self._find_or_claim(key_hash)
+            window, current, previous, previous_weight = self._counts(index, time.time(), expiry)
+
+            if floor(previous * previous_weight) + current + amount > limit:
+                self._write(index, key_hash, window, expiry, current, previous)
+                return False
+
+            self._write(index, key_hash, window, expiry, current + amount, previous)
+            return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        now = time.time()
+        with self._locked():
+            index = self._find(self._hash(key))
+            if index is None:
+                return 0, 0.0, 0, float(expiry)
+            _, current, previous, previous_weight = self._counts(index, now, expiry)
+
+        current_ttl = expiry - now % expiry
+        return previous, previous_weight * expiry if previous else 0.0, current, current_ttl + expiry
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        key_hash = self._hash(key)
+        with self._locked():
+            index = self._find_or_claim(key_hash)
+            window, current, previous, _ = self._counts(index, time.time(), expiry)
+            self._write(index, key_hash, window, expiry, current + amount, previous)
+
+        return current + amount
+
+    def get(self, key: str) -> int:
+        with self._locked():
+            index = self._find(self._hash(key))
+            if index is None:
+                return 0
+            _, window, expiry, current, _ = self._read(index)
+
+        return current if expiry and window == int(time.time() // expiry) else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._locked():
+            index = self._find(self._hash(key))
+            expiry = self._read(index)[2] if index is not None else 0
+
+        now = time.time()
+        return now + (expiry - now % expiry) if expiry else now
+
+    def check(self) -> bool:
+        return True
+
+    def reset(self) -> int | None:
+        with self._locked():
+            self._buf[: self.size] = bytes(self.size)
+
+        return None
+
+    def clear(self, key: str) -> None:
+        with self._locked():
+            index = self._find(self._hash(key))
+            if index is not None:
+                self._write(index, 0, 0, 0, 0, 0)
+
+    def unlink(self) -> None:
+        """Remove the shared memory segment, once no worker uses it anymore."""
+        self._shm.close()
+        self._shm.unlink()
+
+
+class _FileLock:
+    """Hold a thread lock and an exclusive `flock` on a file, for in-process and cross-process exclusion."""
+
+    def __init__(self, thread_lock: threading.Lock, lock_file: Any) -> None:
+        self.thread_lock = thread_lock
+        self.lock_file = lock_file
+
+    def __enter__(self) -> None:
+        self.thread_lock.acquire()
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+
+    def __exit__(self, *_: Any) -> None:
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+
+ACQUIRE_SQL = """
+WITH previous AS (
+    SELECT coalesce(max(count), 0) AS count
+    FROM rate_limit_counters
+    WHERE key = %(key)s AND window_start = %(previous_window)s
+)
+INSERT INTO rate_limit_counters AS counter (key, window_start, count, expires_at)
+SELECT %(key)s, %(window)s, %(amount)s, %(expires_at)s
+FROM previous
+WHERE floor(previous.count * %(previous_weight)s) + %(amount)s <= %(limit)s
+ON CONFLICT (key, window_start) DO UPDATE
+SET count = counter.count + excluded.count
+WHERE floor((SELECT count FROM previous) * %(previous_weight)s) + counter.count + excluded.count <= %(limit)s
+RETURNING counter.count
+"""
+
+INCR_SQL = """
+INSERT INTO rate_limit_counters AS counter (key, window_start, count, expires_at)
+VALUES (%(key)s, %(window)s, %(amount)s, %(expires_at)s)
+ON CONFLICT (key, window_start) DO UPDATE SET count = counter.count + excluded.count
+RETURNING counter.count
+"""
+
+WINDOWS_SQL = """
+SELECT window_start, count
+FROM rate_limit_counters
+WHERE key = %(key)s AND window_start IN (%(previous_window)s, %(window)s)
+"""
+
+LATEST_SQL = """
+SELECT count, expires_at
+FROM rate_limit_counters
+WHERE key = %(key)s AND expires_at > now()
+ORDER BY window_start DESC
+LIMIT 1
+"""
+
+CLEANUP_SQL = "DELETE FROM rate_limit_counters WHERE expires_at < now()"
+
+
+class PostgresStorage(Storage, SlidingWindowCounterSupport):
+    """Sliding-window counters in the `rate_limit_counters` table, shared by every worker and replica.
+
+    Each hit is one atomic `INSERT ... ON CONFLICT DO UPDATE ... WHERE` that only increments the
+    current window if the weighted count stays under the limit. Each key has at most two live rows,
+    and expired windows are deleted every `cleanup_interval` seconds.
+    `limits` calls storages synchronously, so this storage uses its own psycopg connection and each
+    hit blocks the event loop for a round trip, bounded by `connect_timeout` seconds to connect and
+    `statement_timeout_ms` per statement.
+    """
+
+    STORAGE_SCHEME = ["fastauth+postgresql"]
+    DEPENDENCIES = ["psycopg"]
+
+    def __init__(
+        self,
+        uri: str,
+        wrap_exceptions: bool = False,
+        cleanup_interval: float = 60.0,
+        connect_timeout: int = 2,
+        statement_timeout_ms: int = 200,
+        **options: Any,
+    ) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.dsn = uri.replace("fastauth+postgresql://", "postgresql://", 1)
+        self.cleanup_interval = cleanup_interval
+        self.connect_timeout = int(connect_timeout)
+        self.statement_timeout_ms = int(statement_timeout_ms)
+        self._next_cleanup = 0.0
+        self._connection: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def base_exceptions(self) -> type[Exception] | tuple[type[Exception], ...]:
+        return self.dependencies["psycopg"].module.Error
+
+    def _execute(self, sql: str, params: dict[str, Any] | None = None) -> list[tuple[Any, ...]]:
+        psycopg = self.dependencies["psycopg"].module
+
+        with self._lock:
+            if self._connection is None or self._connection.closed:
+                self._connection = psycopg.connect(
+                    self.dsn,
+                    autocommit=True,
+                    prepare_threshold=None,
+                    connect_timeout=self.connect_timeout,
+                    options=f"-c statement_timeout={self.statement_timeout_ms}",
+                )
+
+            try:
+                with self._connection.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall() if cursor.description is not None else []
+            except psycopg.OperationalError:
+                self._connection.close()
+                raise
+
+    def _cleanup(self, now: float) -> None:
+        if now >= self._next_cleanup:
+            self._next_cleanup = now + self.cleanup_interval
+            self._execute(CLEANUP_SQL)
+
+    @staticmethod
+    def _params(key: str, expiry: int, now: float, **params: Any) -> dict[str, Any]:
+        window, previous_weight = _window(now, expiry)
+        return {
+            "key": key,
+            "window": window,
+            "previous_window": window - 1,
+            "previous_weight": previous_weight,
+            "expires_at": datetime.fromtimestamp((window + 2) * expiry, UTC),
+            **params,
+        }
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+
+        now = time.time()
+        self._cleanup(now)
+        rows = self._execute(ACQUIRE_SQL, self._params(key, expiry, now, limit=limit, amount=amount))
+        return len(rows) == 1
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        now = time.time()
+        params = self._params(key, expiry, now)
+        counts = dict(self._execute(WINDOWS_SQL, params))
+        previous = counts.get(params["previous_window"], 0)
+        current = counts.get(params["window"], 0)
+
+        current_ttl = expiry - now % expiry
+        return previous, params["previous_weight"] * expiry if previous else 0.0, current, current_ttl + expiry
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        self.clear(key)
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        self._cleanup(now)
+        return self._execute(INCR_SQL, self._params(key, expiry, now, amount=amount))[0][0]
+
+    def get(self, key: str) -> int:
+        rows = self._execute(LATEST_SQL, {"key": key})
+        return rows[0][0] if rows else 0
+
+    def get_expiry(self, key: str) -> float:
+        rows = self._execute(LATEST_SQL, {"key": key})
+        return rows[0][1].timestamp() if rows else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._execute("SELECT 1")
+        except Exception:
+            return False
+
+        return True
+
+    def reset(self) -> int | None:
+        return len(self._execute("DELETE FROM rate_limit_counters RETURNING 1"))
+
+    def clear(self, key: str) -> None:
+        self._execute("DELETE FROM rate_limit_counters WHERE key = %(key)s", {"key": key})
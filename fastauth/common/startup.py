@@ -0,0 +1,63 @@
+"""Cold start cost of a worker: the import of the application and each phase of the lifespan.
+
+The durations are logged once the worker is ready and reported on `/stats`, `fastauth import-report`
+breaks the import down by module.
+"""
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+from fastauth import IMPORT_STARTED
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Durations of the import of `fastauth.main` and of the named lifespan phases, in seconds."""
+
+    def __init__(self, import_started: float) -> None:
+        self.import_started = import_started
+        self.import_seconds: float | None = None
+        self.lifespan_started: float | None = None
+        self.lifespan_seconds: float | None = None
+        self.phases: dict[str, float] = {}
+
+    def imported(self) -> None:
+        self.import_seconds = time.perf_counter() - self.import_started
+
+    def starting(self) -> None:
+        self.lifespan_started = time.perf_counter()
+        self.lifespan_seconds = None
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def ready(self) -> None:
+        if self.lifespan_started is not None:
+            self.lifespan_seconds = time.perf_counter() - self.lifespan_started
+
+        logger.info(
+            "Worker ready: import %.0f ms, lifespan %.0f ms (%s)",
+            (self.import_seconds or 0.0) * 1000,
+            (self.lifespan_seconds or 0.0) * 1000,
+            ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases.items()) or "no timed phase",
+        )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "import_seconds": self.import_seconds,
+            "lifespan_seconds": self.lifespan_seconds,
+            "phases": dict(self.phases),
+        }
+
+
+startup_timer = StartupTimer(import_started=IMPORT_STARTED)
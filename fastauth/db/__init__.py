@@ -1,10 +1,20 @@
-from fastauth.db.database import get_async_engine, get_async_session, init_db
+from fastauth.db.database import (
+    get_async_engine,
+    get_async_replica_engine,
+    get_async_session,
+    get_async_session_factory,
+    get_pool_status,
+    init_db,
+)
 from fastauth.db.repository import TokenRepository, UserRepository
 
 __all__ = [
     "TokenRepository",
     "UserRepository",
     "get_async_session",
+    "get_async_session_factory",
+    "get_pool_status",
     "init_db",
     "get_async_engine",
+    "get_async_replica_engine",
 ]
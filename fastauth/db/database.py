@@ -1,15 +1,55 @@
-from typing import Annotated, AsyncGenerator
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator
 from uuid import uuid4
 
-from fastapi import Depends
+from fastapi import Request
+from sqlalchemy import Engine, Select
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection, QueuePool
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
 from sqlmodel import SQLModel
 
 from fastauth.common.exceptions import DatabaseException
 from fastauth.common.settings import settings
 
 
+@dataclass
+class PoolCheckoutStats:
+    """Cumulative time spent waiting for a connection to be checked out of the pool."""
+
+    checkouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = PoolCheckoutStats()
+
+    def connect(self) -> PoolProxiedConnection:
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.checkout_stats.record(time.perf_counter() - started)
+
+
 def _build_async_uri(raw_uri: str) -> str:
     if raw_uri.startswith("postgresql+asyncpg://"):
         return raw_uri
@@ -20,38 +60,168 @@ def _build_async_uri(raw_uri: str) -> str:
     return raw_uri
 
 
-def get_async_engine() -> AsyncEngine:
+def _connect_args() -> dict[str, Any]:
+    if settings.DB_CONNECTION_MODE == "direct":
+        # Statements are prepared once per connection and reused, both by asyncpg and by the dialect
+        return {
+            "ssl": "require",
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        }
+
+    # A transaction-mode pooler may run each statement on a different server connection
+    return {
+        "ssl": "require",
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+def get_async_engine(url: str | None = None) -> AsyncEngine:
+    """Build the process-wide engine of `url`, the primary by default. Called once from the application lifespan."""
+    if url is None:
+        url = settings.FASTAUTH_POSTGRES_POOLER_CONNECTION_STRING
+        if settings.DB_CONNECTION_MODE == "direct":
+            url = settings.FASTAUTH_POSTGRES_DIRECT_CONNECTION_STRING or url
+
     return create_async_engine(
-        _build_async_uri(settings.FASTAUTH_POSTGRES_POOLER_CONNECTION_STRING),
+        _build_async_uri(url),
         echo=settings.DEBUG,
         future=True,
-        connect_args={
-            "ssl": "require",
-            "statement_cache_size": 0,
-            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
-        },
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=_connect_args(),
     )
 
 
-async def init_db(engine: Annotated[AsyncEngine, Depends(get_async_engine)]) -> None:
-    async with engine.begin() as async_conn:
-        await async_conn.run_sync(SQLModel.metadata.create_all)
+def get_async_replica_engine() -> AsyncEngine | None:
+    """Engine of the read replica, None when `FASTAUTH_POSTGRES_REPLICA_CONNECTION_STRING` is unset."""
+    if settings.FASTAUTH_POSTGRES_REPLICA_CONNECTION_STRING is None:
+        return None
+
+    return get_async_engine(settings.FASTAUTH_POSTGRES_REPLICA_CONNECTION_STRING)
+
+
+def _writes(clause: Any) -> bool:
+    """Whether `clause` is or embeds an INSERT, UPDATE or DELETE, such as a data-modifying CTE."""
+    return any(isinstance(element, UpdateBase) for element in visitors.iterate(clause))
+
+
+class RoutingSession(Session):
+    """Session reading from `replica_bind` and writing to its own bind, the primary.
+
+    Plain SELECTs go to the replica. Flushes, DML and `SELECT ... FOR UPDATE` go to the primary, and
+    from the first of them on every statement of the session does, so a request reads its own writes.
+    """
 
+    def __init__(self, *args: Any, replica_bind: Engine | None = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.replica_bind = replica_bind
+        self.wrote = False
+        self.force_primary = False
 
-async def get_async_session(
-    engine: Annotated[AsyncEngine, Depends(get_async_engine)],
-) -> AsyncGenerator[AsyncSession, None]:
-    async_session = async_sessionmaker(
+    @property
+    def reads_replica(self) -> bool:
+        return self.replica_bind is not None and not self.wrote and not self.force_primary
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Any:
+        if self.replica_bind is not None:
+            # Flushes ask for the bind of each mapper without a clause
+            if self._flushing or (clause is not None and _writes(clause)):
+                self.wrote = True
+            elif self.reads_replica and isinstance(clause, Select) and clause._for_update_arg is None:
+                return self.replica_bind
+
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+def reads_from_replica(session: AsyncSession) -> bool:
+    sync_session = session.sync_session
+    return isinstance(sync_session, RoutingSession) and sync_session.reads_replica
+
+
+@contextmanager
+def on_primary(session: AsyncSession) -> Iterator[None]:
+    """Send the reads of `session` to the primary within the block."""
+    sync_session = session.sync_session
+    if not isinstance(sync_session, RoutingSession):
+        yield
+        return
+
+    force_primary = sync_session.force_primary
+    sync_session.force_primary = True
+    try:
+        yield
+    finally:
+        sync_session.force_primary = force_primary
+
+
+def get_async_session_factory(
+    engine: AsyncEngine, replica_engine: AsyncEngine | None = None
+) -> async_sessionmaker[AsyncSession]:
+    """Sessions of `engine`, reading from `replica_engine` when given, see `RoutingSession`."""
+    if replica_engine is None:
+        return async_sessionmaker(
+            bind=engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    return async_sessionmaker(
         bind=engine,
         autoflush=False,
         expire_on_commit=False,
+        sync_session_class=RoutingSession,
+        replica_bind=replica_engine.sync_engine,
     )
-    async with async_session() as session:
+
+
+def get_pool_status(engine: AsyncEngine) -> dict[str, Any]:
+    """Snapshot of the engine pool, used to size the pool against the worker count."""
+    pool = engine.pool
+    status: dict[str, Any] = {"pool_class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        stats = pool.checkout_stats
+        status.update(
+            checkouts=stats.checkouts,
+            checkout_wait_total_seconds=stats.total_wait,
+            checkout_wait_avg_seconds=stats.total_wait / stats.checkouts if stats.checkouts else 0.0,
+            checkout_wait_max_seconds=stats.max_wait,
+        )
+
+    return status
+
+
+async def init_db(engine: AsyncEngine) -> None:
+    async with engine.begin() as async_conn:
+        await async_conn.run_sync(SQLModel.metadata.create_all)
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session_factory: async_sessionmaker[AsyncSession] = request.app.state.async_session_factory
+
+    async with session_factory() as session:
         try:
             yield session
             await session.commit()
-        except Exception as e:
+        except SQLAlchemyError as e:
             await session.rollback()
             raise DatabaseException("An error occurred during the session") from e
+        except Exception:
+            await session.rollback()
+            raise
         finally:
             await session.close()
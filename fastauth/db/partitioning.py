@@ -0,0 +1,188 @@
+"""Optional Postgres layout where `tokens` is range-partitioned by `expires_at`.
+
+Partitions are named `tokens_pYYYYMMDD` after the first day they cover. A fully expired partition
+only holds expired tokens, so retention is a `DROP TABLE` instead of row-by-row deletes.
+"""
+
+import logging
+import re
+from datetime import UTC, date, datetime, time, timedelta
+from typing import Any, Literal
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from fastauth.common.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+type PartitionInterval = Literal["daily", "weekly"]
+
+PARTITION_NAME_PATTERN = re.compile(r"^tokens_p(\d{8})$")
+
+LIST_PARTITIONS_SQL = """
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = 'tokens'
+"""
+
+# Serializes maintenance across workers starting at the same time
+LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('fastauth.tokens.partitions'))"
+
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+def _lock_not_available(exc: DBAPIError) -> bool:
+    return getattr(exc.orig, "sqlstate", None) == LOCK_NOT_AVAILABLE
+
+
+def partition_start(day: date, interval: PartitionInterval) -> date:
+    """First day of the partition containing `day`, weekly partitions start on Monday."""
+    if interval == "weekly":
+        return day - timedelta(days=day.weekday())
+
+    return day
+
+
+def partition_step(interval: PartitionInterval) -> timedelta:
+    return timedelta(weeks=1) if interval == "weekly" else timedelta(days=1)
+
+
+def partition_name(start: date) -> str:
+    return f"tokens_p{start:%Y%m%d}"
+
+
+def _bound(day: date) -> str:
+    return datetime.combine(day, time(), tzinfo=UTC).isoformat(sep=" ")
+
+
+def create_partition_sql(start: date, interval: PartitionInterval) -> str:
+    end = start + partition_step(interval)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF tokens "
+        f"FOR VALUES FROM ('{_bound(start)}') TO ('{_bound(end)}')"
+    )
+
+
+def partitions_to_create(today: date, horizon: timedelta, interval: PartitionInterval) -> list[date]:
+    """Start days of every partition between `today` and `today + horizon`, both included."""
+    start = partition_start(today, interval)
+    last = partition_start(today + horizon, interval)
+
+    starts = []
+    while start <= last:
+        starts.append(start)
+        start += partition_step(interval)
+
+    return starts
+
+
+def partitions_to_drop(names: list[str], today: date, interval: PartitionInterval) -> list[str]:
+    """Partitions whose whole range is before `today`, so every token they hold has expired."""
+    expired = []
+    for name in names:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match is None:
+            continue
+
+        start = datetime.strptime(match.group(1), "%Y%m%d").date()
+        if start + partition_step(interval) <= today:
+            expired.append(name)
+
+    return sorted(expired)
+
+
+class TokenPartitionMaintainer(PeriodicTask):
+    """Create upcoming `tokens` partitions ahead of time and drop fully expired ones.
+
+    Partitions are created up to `horizon` past today, which must cover the longest token lifetime:
+    inserting a token that falls outside every partition fails.
+
+    Creating and dropping a partition take an ACCESS EXCLUSIVE lock on `tokens`. Queued behind a
+    long query, that lock would block every token read and write, so each wait is bounded by
+    `lock_timeout_ms`: a partition that cannot be dropped in time is dropped at a later run.
+    """
+
+    name = "token-partition-maintainer"
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        interval: float,
+        partition_interval: PartitionInterval,
+        horizon: timedelta,
+        lock_timeout_ms: int = 1_000,
+    ) -> None:
+        super().__init__(interval=interval)
+        self.engine = engine
+        self.partition_interval = partition_interval
+        self.horizon = horizon
+        self.lock_timeout_ms = lock_timeout_ms
+        self.last_run_created: list[str] = []
+        self.last_run_dropped: list[str] = []
+
+    async def run_once(self) -> dict[str, list[str]]:
+        today = datetime.now(UTC).date()
+
+        async with self.engine.begin() as conn:
+            await conn.execute(text(LOCK_SQL))
+            await conn.execute(text(f"SET LOCAL lock_timeout = {int(self.lock_timeout_ms)}"))
+            existing = set((await conn.execute(text(LIST_PARTITIONS_SQL))).scalars().all())
+
+            created = []
+            for start in partitions_to_create(today, self.horizon, self.partition_interval):
+                if partition_name(start) not in existing:
+                    await conn.execute(text(create_partition_sql(start, self.partition_interval)))
+                    created.append(partition_name(start))
+
+            dropped = []
+            for name in partitions_to_drop(sorted(existing), today, self.partition_interval):
+                try:
+                    async with conn.begin_nested():
+                        await conn.execute(text(f"DROP TABLE {name}"))
+                except DBAPIError as exc:
+                    if not _lock_not_available(exc):
+                        raise
+                    logger.warning("Token partition %s is in use, it is dropped at a later run", name)
+                    continue
+                dropped.append(name)
+
+        self.last_run_created = created
+        self.last_run_dropped = dropped
+        logger.info("Token partitions created: %s, dropped: %s", created, dropped)
+
+        return {"created": created, "dropped": dropped}
+
+    async def current_partition_exists(self) -> bool:
+        current = partition_name(partition_start(datetime.now(UTC).date(), self.partition_interval))
+        async with self.engine.connect() as conn:
+            existing = (await conn.execute(text(LIST_PARTITIONS_SQL))).scalars().all()
+
+        return current in existing
+
+    async def run_at_startup(self) -> None:
+        """First run, before serving, tolerating a lock timeout when the current partition already exists.
+
+        Tokens issued right away land in the current partition, the later ones are created by the
+        background runs; failing the startup would only get the worker restarted into the same wait.
+        """
+        try:
+            await self.run_once()
+        except DBAPIError as exc:
+            if not _lock_not_available(exc):
+                raise
+
+            if not await self.current_partition_exists():
+                raise
+
+            logger.warning("Token partitions could not be locked at startup, they are maintained in the background")
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "partition_interval": self.partition_interval,
+            "last_run_created": self.last_run_created,
+            "last_run_dropped": self.last_run_dropped,
+        }
@@ -1,13 +1,19 @@
+import functools
 from collections.abc import Sequence
 from datetime import UTC, datetime
 from typing import Any
 from uuid import UUID
 
+from sqlalchemy import Select, bindparam, exists, inspect, literal, union, union_all
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlmodel import col, delete, select, update
 
+from fastauth.common.metrics import metrics
+from fastauth.db.database import on_primary, reads_from_replica
 from fastauth.models import Token, User
+from fastauth.models.token import TokenType
 
 
 class Repository[T]:
@@ -20,37 +26,93 @@ class Repository[T]:
 
     __model__: type[T]
 
+    @classmethod
+    @functools.cache
+    def _get_or_none_statement(cls, keys: tuple[str, ...], null_keys: tuple[str, ...] = ()) -> Select:
+        """SELECT filtering on `keys` by equality and on `null_keys` by IS NULL, built once per repository and keys."""
+        return select(cls.__model__).where(
+            *(getattr(cls.__model__, key) == bindparam(key) for key in keys),
+            *(getattr(cls.__model__, key).is_(None) for key in null_keys),
+        )
+
     @staticmethod
+    @metrics.repository_method
     async def create(session: AsyncSession, item: T) -> T:
         session.add(item)
         await session.flush()
 
         return item
 
-    async def update(self, session: AsyncSession, id_: Any, **kwargs) -> T:
-        bd_item = await session.get_one(self.__model__, id_)
-
-        for key, value in kwargs.items():
-            setattr(bd_item, key, value)
+    @staticmethod
+    @metrics.repository_method
+    async def create_many(session: AsyncSession, items: Sequence[T]) -> Sequence[T]:
+        """Insert all items with a single flush.
 
+        The unit of work batches rows of the same model into one multi-row `INSERT ... RETURNING`
+        on drivers that support it (asyncpg), so this costs one round trip whatever the number of items.
+        """
+        session.add_all(items)
         await session.flush()
-        await session.refresh(bd_item)
 
-        return bd_item
+        return items
 
-    async def get_or_none(self, session: AsyncSession, **kwargs) -> T | None:
-        filter_kwargs = [getattr(self.__model__, key) == value for key, value in kwargs.items()]
+    @metrics.repository_method
+    async def update(self, session: AsyncSession, id_: Any, use_identity_map: bool = False, **kwargs) -> T:
+        """Update the row with primary key `id_` and return it, raising `NoResultFound` when there is none.
+
+        Issues a single `UPDATE ... RETURNING`, refreshing the instance already in the session if any.
+        With `use_identity_map` the row is loaded, modified and flushed through the unit of work instead,
+        so ORM events and relationship cascades apply, at the cost of three round trips.
+        """
+        if use_identity_map:
+            bd_item = await session.get_one(self.__model__, id_)
 
-        statement = select(self.__model__).where(*filter_kwargs)
+            for key, value in kwargs.items():
+                setattr(bd_item, key, value)
 
+            await session.flush()
+            await session.refresh(bd_item)
+
+            return bd_item
+
+        primary_key = inspect(self.__model__).primary_key[0]
+        statement = (
+            update(self.__model__)
+            .where(primary_key == id_)
+            .values(**kwargs)
+            .returning(self.__model__)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
         response = await session.execute(statement)
 
-        return response.scalars().first()
+        return response.scalar_one()
+
+    @metrics.repository_method
+    async def get_or_none(self, session: AsyncSession, **kwargs) -> T | None:
+        """Row matching every keyword, or None. A miss on the read replica is retried on the primary."""
+        # `column = NULL` matches nothing, so None values compile to `IS NULL` instead of a parameter
+        params = {key: value for key, value in kwargs.items() if value is not None}
+        statement = self._get_or_none_statement(
+            tuple(params), tuple(key for key, value in kwargs.items() if value is None)
+        )
+
+        response = await session.execute(statement, params)
+        item = response.scalars().first()
+
+        # The row may have been written by another request and not be replicated yet
+        if item is None and reads_from_replica(session):
+            with on_primary(session):
+                response = await session.execute(statement, params)
+            item = response.scalars().first()
 
+        return item
+
+    @metrics.repository_method
     async def get_all(self, session: AsyncSession) -> Sequence[T]:
         response = await session.execute(select(self.__model__))
         return response.scalars().all()
 
+    @metrics.repository_method
     async def delete(self, session: AsyncSession, id_: Any) -> bool:
         try:
             item = await session.get_one(self.__model__, id_)
@@ -65,14 +127,159 @@ class Repository[T]:
 class UserRepository(Repository[User]):
     __model__ = User
 
+    @metrics.repository_method
+    async def upsert_oauth_user(self, session: AsyncSession, user: User) -> User:
+        """User linked to the OAuth identity of `user`, linking the user with its email or inserting `user`.
+
+        On Postgres this is a single statement: the user linked to the identity, if any, is returned as is,
+        otherwise `INSERT ... ON CONFLICT (email) DO UPDATE` links the user owning the email or inserts
+        `user`, so concurrent first logins of one identity cannot both insert. Other dialects take up
+        to three round trips.
+        """
+        identity = (col(User.oauth_provider) == user.oauth_provider, col(User.oauth_id) == user.oauth_id)
+
+        if session.get_bind().dialect.name == "postgresql":
+            table = inspect(User).local_table
+            row = Select(*(literal(getattr(user, column.name), column.type) for column in table.columns))
+            linked = table.select().where(*identity).cte("linked")
+            upserted = (
+                postgresql.insert(table)
+                .from_select([column.name for column in table.columns], row.where(~exists(linked.select())))
+                .on_conflict_do_update(
+                    index_elements=[table.c.email],
+                    set_={"oauth_provider": user.oauth_provider, "oauth_id": user.oauth_id},
+                )
+                .returning(*table.columns)
+                .cte("upserted")
+            )
+            statement = select(User).from_statement(union_all(linked.select(), upserted.select()))
+            response = await session.execute(statement, execution_options={"populate_existing": True})
+            return response.scalars().one()
+
+        existing = await self.get_or_none(session, oauth_provider=user.oauth_provider, oauth_id=user.oauth_id)
+        if existing is not None:
+            return existing
+
+        existing = await self.get_or_none(session, email=user.email)
+        if existing is None:
+            return await self.create(session, user)
+
+        return await self.update(session, existing.id, oauth_provider=user.oauth_provider, oauth_id=user.oauth_id)
+
+    @metrics.repository_method
+    async def get_by_ids(self, session: AsyncSession, ids: Sequence[UUID]) -> dict[UUID, User]:
+        """Users among `ids`, by id, in one query plus one on the primary for the ids missing from the replica."""
+        if not ids:
+            return {}
+
+        response = await session.execute(select(User).where(col(User.id).in_(ids)))
+        users = {user.id: user for user in response.scalars()}
+
+        missing = [id_ for id_ in ids if id_ not in users]
+        if missing and reads_from_replica(session):
+            with on_primary(session):
+                response = await session.execute(select(User).where(col(User.id).in_(missing)))
+            users.update((user.id, user) for user in response.scalars())
+
+        return users
+
+    @metrics.repository_method
+    async def bump_token_epoch(self, session: AsyncSession, user_id: UUID) -> None:
+        """Increment the token epoch of the user, revoking its access tokens carrying an older one."""
+        statement = (
+            update(User)
+            .where(col(User.id) == user_id)
+            .values(token_epoch=col(User.token_epoch) + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(statement)
+
 
 class TokenRepository(Repository[Token]):
     __model__ = Token
 
+    async def get_by_token(self, session: AsyncSession, token: str, **kwargs) -> Token | None:
+        # Not wrapped in `metrics.repository_method`: the lookup is timed and counted as `get_or_none`
+        return await self.get_or_none(session, token_hash=Token.hash_token(token), **kwargs)
+
+    @metrics.repository_method
+    async def get_live_with_users(
+        self, session: AsyncSession, token_hashes: Sequence[str]
+    ) -> dict[str, tuple[Token, User]]:
+        """Tokens among `token_hashes` that are neither revoked nor expired, with their user, by hash.
+
+        A single `IN (...)` query joined to `users`, whatever the number of hashes, plus one on the
+        primary for the hashes missing from the read replica.
+        """
+        if not token_hashes:
+            return {}
+
+        statement = select(Token, User).join(User, col(User.id) == col(Token.user_id))
+        live = [col(Token.revoked).is_(False), col(Token.expires_at) > datetime.now(UTC)]
+        response = await session.execute(statement.where(col(Token.token_hash).in_(token_hashes), *live))
+        rows = {token.token_hash: (token, user) for token, user in response.all()}
+
+        missing = [token_hash for token_hash in token_hashes if token_hash not in rows]
+        if missing and reads_from_replica(session):
+            with on_primary(session):
+                response = await session.execute(statement.where(col(Token.token_hash).in_(missing), *live))
+            rows.update((token.token_hash, (token, user)) for token, user in response.all())
+
+        return rows
+
+    @metrics.repository_method
     async def delete_expired(self, session: AsyncSession) -> None:
         statement = delete(Token).where(col(Token.expires_at) < datetime.now(UTC))
         await session.execute(statement)
 
+    @metrics.repository_method
+    async def delete_expired_batch(self, session: AsyncSession, batch_size: int, include_expired: bool = True) -> int:
+        """Delete at most `batch_size` expired or revoked tokens and return how many were removed."""
+        batch = select(Token.id).where(col(Token.revoked).is_(True))
+        if include_expired:
+            # A union rather than OR, so each side reads its own index
+            batch = union(batch, select(Token.id).where(col(Token.expires_at) < datetime.now(UTC)))
+
+        batch = batch.limit(batch_size)
+        statement = delete(Token).where(col(Token.id).in_(batch))
+        response = await session.execute(statement)
+
+        return response.rowcount
+
+    @metrics.repository_method
+    async def rotate_refresh_token(self, session: AsyncSession, token: str) -> User | None:
+        """Revoke `token` if it is a live refresh token and return its user, None otherwise.
+
+        The conditional UPDATE only matches a refresh token that is neither revoked nor expired, so of
+        concurrent rotations of the same token exactly one gets the user back. On Postgres the update
+        and the user lookup are a single statement, other dialects look the user up separately.
+        """
+        revoke = (
+            update(Token)
+            .where(
+                col(Token.token_hash) == Token.hash_token(token),
+                col(Token.token_type) == TokenType.REFRESH,
+                col(Token.revoked).is_(False),
+                col(Token.expires_at) > datetime.now(UTC),
+            )
+            .values(revoked=True)
+            .returning(col(Token.user_id))
+        )
+
+        if session.get_bind().dialect.name == "postgresql":
+            revoked = revoke.cte("revoked")
+            statement = select(User).join(revoked, col(User.id) == revoked.c.user_id)
+            response = await session.execute(statement)
+            return response.scalars().first()
+
+        response = await session.execute(revoke, execution_options={"synchronize_session": False})
+        user_id = response.scalar_one_or_none()
+        if user_id is None:
+            return None
+
+        return await session.get(User, user_id)
+
+    @metrics.repository_method
     async def revoke_all_for_user(self, session: AsyncSession, user_id: UUID) -> None:
         statement = (
             update(Token).where(col(Token.user_id) == user_id, col(Token.revoked).is_(False)).values(revoked=True)
@@ -1,31 +1,156 @@
+import asyncio
 from contextlib import asynccontextmanager
+from datetime import timedelta
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.requests import Request
 
-from fastauth.common.exceptions import DatabaseException
+from fastauth.common.admission import login_admission, register_admission
+from fastauth.common.exceptions import AdmissionRejectedException, DatabaseException, HashingUnavailableException
+from fastauth.common.metrics import MetricsMiddleware, metrics
 from fastauth.common.rate_limit import limiter
 from fastauth.common.settings import settings
-from fastauth.db import get_async_engine, init_db
-from fastauth.routers import auth_router, google_auth_router
+from fastauth.common.startup import startup_timer
+from fastauth.db import (
+    TokenRepository,
+    get_async_engine,
+    get_async_replica_engine,
+    get_async_session_factory,
+    get_pool_status,
+    init_db,
+)
+from fastauth.db.partitioning import TokenPartitionMaintainer, partition_step
+from fastauth.routers import auth_router
+from fastauth.services.password import build_context, calibrate_cost, password_hasher
+from fastauth.services.signing import key_ring
+from fastauth.services.token_cache import token_cache
+from fastauth.services.token_reaper import TokenReaper
+from fastauth.services.warmup import warm_up
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_db(engine=get_async_engine())
+    startup_timer.starting()
+    app.state.ready = False
+    engine = get_async_engine()
+    replica_engine = get_async_replica_engine()
+    app.state.async_engine = engine
+    app.state.async_replica_engine = replica_engine
+    app.state.async_session_factory = get_async_session_factory(engine, replica_engine)
+
+    if settings.DB_CREATE_ALL:
+        with startup_timer.phase("create_all"):
+            await init_db(engine=engine)
+
+    password_scheme = settings.PASSWORD_HASH_SCHEME
+    if settings.PASSWORD_HASH_TARGET_MS is not None:
+        argon2_parameters = {
+            "argon2_memory_cost": settings.PASSWORD_HASH_ARGON2_MEMORY_KIB,
+            "argon2_parallelism": settings.PASSWORD_HASH_ARGON2_PARALLELISM,
+        }
+        with startup_timer.phase("password_calibration"):
+            password_cost = await asyncio.to_thread(
+                calibrate_cost,
+                password_scheme,
+                settings.PASSWORD_HASH_TARGET_MS / 1000,
+                min_cost=settings.PASSWORD_HASH_COST,
+                **argon2_parameters,
+            )
+        password_hasher.configure(build_context(password_scheme, password_cost, **argon2_parameters))
+    metrics.watch_engine(engine, pool_status=lambda: get_pool_status(engine))
+    if replica_engine is not None:
+        metrics.watch_engine(replica_engine, pool_status=lambda: get_pool_status(replica_engine), pool="replica")
+
+    partition_interval = settings.TOKEN_PARTITION_INTERVAL
+    partition_maintainer = None
+    if partition_interval != "none":
+        partition_maintainer = TokenPartitionMaintainer(
+            engine=engine,
+            interval=settings.TOKEN_PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+            partition_interval=partition_interval,
+            horizon=timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
+            + partition_step(partition_interval) * settings.TOKEN_PARTITION_PREMAKE,
+            lock_timeout_ms=settings.TOKEN_PARTITION_LOCK_TIMEOUT_MS,
+        )
+        # Partitions for the tokens issued right away must exist before serving
+        with startup_timer.phase("token_partitions"):
+            await partition_maintainer.run_at_startup()
+        partition_maintainer.start()
+    app.state.partition_maintainer = partition_maintainer
+
+    token_reaper = TokenReaper(
+        session_factory=app.state.async_session_factory,
+        token_repository=TokenRepository(),
+        interval=settings.TOKEN_REAPER_INTERVAL_SECONDS,
+        batch_size=settings.TOKEN_REAPER_BATCH_SIZE,
+        batch_sleep=settings.TOKEN_REAPER_BATCH_SLEEP_SECONDS,
+        include_expired=partition_maintainer is None,
+    )
+    app.state.token_reaper = token_reaper
+    if settings.TOKEN_REAPER_ENABLED:
+        token_reaper.start()
+
+    openid_metadata_refresher = None
+    google_transport = None
+    if settings.GOOGLE_CLIENT_ID is not None:
+        from fastauth.services.oauth2 import OpenIDMetadataRefresher, http_transport, oauth
+
+        google_transport = http_transport
+
+        # The first load runs right away in the background, a failure is retried at the next interval
+        openid_metadata_refresher = OpenIDMetadataRefresher(
+            client=oauth.google,
+            metadata_url=settings.GOOGLE_SERVER_METADATA_URL,
+            transport=http_transport,
+            interval=settings.GOOGLE_METADATA_REFRESH_SECONDS,
+        )
+        openid_metadata_refresher.start()
+    app.state.openid_metadata_refresher = openid_metadata_refresher
+
+    warmed_up = False
+    if settings.WARMUP_ENABLED:
+        warmed_up = await warm_up(
+            app,
+            [engine] if replica_engine is None else [engine, replica_engine],
+            min_connections=settings.WARMUP_MIN_CONNECTIONS or settings.DB_POOL_SIZE,
+            timeout=settings.WARMUP_TIMEOUT_SECONDS,
+        )
+    app.state.warmed_up = warmed_up
+    app.state.ready = True
+    startup_timer.ready()
+
     yield
 
+    app.state.ready = False
+    await token_reaper.stop()
+    if openid_metadata_refresher is not None:
+        await openid_metadata_refresher.stop()
+    if google_transport is not None:
+        await google_transport.shutdown()
+    if partition_maintainer is not None:
+        await partition_maintainer.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
 
 app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG, lifespan=lifespan)
 
 
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)  # type: ignore
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> Response:
+    route = request.scope.get("route")
+    metrics.rate_limit_rejections.labels(getattr(route, "path", "unmatched")).inc()
+    return _rate_limit_exceeded_handler(request, exc)
 
 
 @app.exception_handler(DatabaseException)
@@ -33,11 +158,30 @@ async def database_exception_handler(_request: Request, exc: DatabaseException)
     return JSONResponse(status_code=409, content={"detail": str(exc)})
 
 
+@app.exception_handler(HashingUnavailableException)
+async def hashing_unavailable_exception_handler(_request: Request, exc: HashingUnavailableException) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+    )
+
+
+@app.exception_handler(AdmissionRejectedException)
+async def admission_rejected_exception_handler(_request: Request, exc: AdmissionRejectedException) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(settings.ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
 # Necessary for OAuth2
-app.add_middleware(
-    SessionMiddleware,  # ty: ignore[invalid-argument-type]
-    secret_key=settings.JWT_SECRET_KEY,
-)
+if settings.GOOGLE_CLIENT_ID is not None:
+    app.add_middleware(
+        SessionMiddleware,  # ty: ignore[invalid-argument-type]
+        secret_key=settings.JWT_SECRET_KEY,
+    )
 
 allowed_origins = [origin.strip() for origin in settings.ALLOWED_ORIGINS.split(",") if origin.strip()]
 
@@ -49,12 +193,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if metrics.enabled:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)  # ty: ignore[invalid-argument-type]
+
 # Include routers
 app.include_router(auth_router, prefix=f"{settings.API_PREFIX}/auth")
-app.include_router(google_auth_router, prefix=f"{settings.API_PREFIX}/auth/google")
+# The Google router imports authlib and registers the client, only load it when it is configured
+if settings.GOOGLE_CLIENT_ID is not None:
+    from fastauth.routers.google_auth import router as google_auth_router
+
+    app.include_router(google_auth_router, prefix=f"{settings.API_PREFIX}/auth/google")
 
 
 @app.get("/")
 def read_root():
     """Test endpoint to check if the server is running."""
     return {"message": "Server is running"}
+
+
+@app.get("/ready")
+def read_ready(request: Request) -> JSONResponse:
+    """Readiness probe: 503 until the worker has started and warmed up, and again once it shuts down."""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+
+    return JSONResponse(content={"status": "ready", "warmed_up": request.app.state.warmed_up})
+
+
+@app.get("/stats")
+def read_stats(request: Request):
+    """Runtime statistics of the worker, used to size the connection pool."""
+    engine = getattr(request.app.state, "async_engine", None)
+    replica_engine = getattr(request.app.state, "async_replica_engine", None)
+    token_reaper = getattr(request.app.state, "token_reaper", None)
+    partition_maintainer = getattr(request.app.state, "partition_maintainer", None)
+    return {
+        "pool": get_pool_status(engine) if engine is not None else None,
+        "replica_pool": get_pool_status(replica_engine) if replica_engine is not None else None,
+        "token_reaper": token_reaper.stats() if token_reaper is not None else None,
+        "token_partitions": partition_maintainer.stats() if partition_maintainer is not None else None,
+        "token_cache": token_cache.stats() if settings.TOKEN_CACHE_ENABLED else None,
+        "admission": {limiter.name: limiter.stats() for limiter in (login_admission, register_admission)},
+        "startup": startup_timer.stats(),
+    }
+
+
+@app.get("/.well-known/jwks.json")
+def read_jwks() -> Response:
+    """Public keys verifying the tokens, empty when they are signed with the shared HMAC secret."""
+    return Response(
+        content=key_ring.jwks,
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}"},
+    )
+
+
+if metrics.enabled:
+
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics() -> Response:
+        """Prometheus metrics of the worker."""
+        content, media_type = metrics.render()
+        return Response(content=content, media_type=media_type)
+
+
+startup_timer.imported()
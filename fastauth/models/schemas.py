@@ -3,6 +3,8 @@ from uuid import UUID
 
 from pydantic import BaseModel, EmailStr, Field
 
+from fastauth.common.settings import settings
+
 
 class UserRegister(BaseModel):
     email: EmailStr
@@ -33,6 +35,25 @@ class MessageResponse(BaseModel):
     message: str
 
 
+class IntrospectionRequest(BaseModel):
+    tokens: list[str] = Field(min_length=1, max_length=settings.INTROSPECTION_MAX_BATCH_SIZE)
+
+
+class IntrospectionResult(BaseModel):
+    """RFC 7662 introspection response of one token, only `active` is set for inactive tokens."""
+
+    active: bool
+    sub: str | None = None
+    username: str | None = None
+    token_type: str | None = None
+    exp: int | None = None
+    jti: str | None = None
+
+
+class IntrospectionResponse(BaseModel):
+    results: list[IntrospectionResult]
+
+
 class GoogleUserInfo(BaseModel):
     email: EmailStr
     email_verified: bool
@@ -1,8 +1,9 @@
+import hashlib
 from datetime import UTC, datetime
 from enum import Enum
 from uuid import UUID
 
-from sqlmodel import Column, DateTime, Field, SQLModel
+from sqlmodel import Column, DateTime, Field, Index, SQLModel, text
 
 
 class TokenType(str, Enum):
@@ -12,11 +13,26 @@ class TokenType(str, Enum):
 
 class Token(SQLModel, table=True):
     __tablename__ = "tokens"
+    # Partial indexes of the revoke and reap queries, their predicates are spelled like the queries' filters
+    __table_args__ = (
+        Index(
+            "ix_tokens_user_id_live",
+            "user_id",
+            postgresql_where=text("revoked IS false"),
+            sqlite_where=text("revoked IS 0"),
+        ),
+        Index(
+            "ix_tokens_id_revoked",
+            "id",
+            postgresql_where=text("revoked IS true"),
+            sqlite_where=text("revoked IS 1"),
+        ),
+    )
 
     id: int | None = Field(default=None, primary_key=True)
-    token: str = Field(index=True)
+    token_hash: str = Field(max_length=64, index=True)
     token_type: TokenType
-    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True)))
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), index=True))
     revoked: bool = Field(default=False)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC),
@@ -26,6 +42,11 @@ class Token(SQLModel, table=True):
     # Relation with the user
     user_id: UUID = Field(foreign_key="users.id", ondelete="CASCADE")
 
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """Fixed-width lookup key of an encoded JWT, the token itself is never stored."""
+        return hashlib.sha256(token.encode()).hexdigest()
+
     @property
     def is_expired(self) -> bool:
         expires = self.expires_at if self.expires_at.tzinfo else self.expires_at.replace(tzinfo=UTC)
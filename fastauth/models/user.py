@@ -3,11 +3,12 @@ from __future__ import annotations
 from datetime import UTC, datetime
 from uuid import UUID, uuid4
 
-from sqlmodel import Column, DateTime, Field, SQLModel
+from sqlmodel import Column, DateTime, Field, Index, SQLModel
 
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_oauth_provider_oauth_id", "oauth_provider", "oauth_id", unique=True),)
 
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     email: str = Field(unique=True, index=True)
@@ -22,6 +23,9 @@ class User(SQLModel, table=True):
         sa_column=Column(DateTime(timezone=True)),
     )
 
+    # Bumped to revoke every access token carrying an older epoch, see ACCESS_TOKEN_REVOCATION
+    token_epoch: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+
     # OAuth fields (optional)
     oauth_provider: str | None = None
     oauth_id: str | None = None
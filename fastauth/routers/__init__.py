@@ -1,4 +1,15 @@
+from typing import Any
+
 from fastauth.routers.auth import router as auth_router
-from fastauth.routers.google_auth import router as google_auth_router
 
 __all__ = ["auth_router", "google_auth_router"]
+
+
+def __getattr__(name: str) -> Any:
+    # The Google router imports authlib, it is only loaded when asked for
+    if name == "google_auth_router":
+        from fastauth.routers.google_auth import router as google_auth_router
+
+        return google_auth_router
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,19 +1,30 @@
+import secrets
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Request, status
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from fastauth.common.rate_limit import limiter
+from fastauth.common.admission import login_admission, register_admission
+from fastauth.common.rate_limit import check_rate_limit, limiter
 from fastauth.common.settings import settings
 from fastauth.db import TokenRepository, UserRepository, get_async_session
-from fastauth.models.schemas import MessageResponse, Token, UserLogin, UserRegister, UserResponse
+from fastauth.models.schemas import (
+    IntrospectionRequest,
+    IntrospectionResponse,
+    MessageResponse,
+    Token,
+    UserLogin,
+    UserRegister,
+    UserResponse,
+)
 from fastauth.models.user import User
 from fastauth.services import auth
 
 router = APIRouter(tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+introspection_client_scheme = HTTPBearer(auto_error=False)
 
 auth_service = auth.AuthService(
     user_repository=UserRepository(),
@@ -29,10 +40,27 @@ async def get_current_user(
     return await auth_service.get_user_from_token(session=session, token=token)
 
 
+async def authorize_introspection_client(
+    credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(introspection_client_scheme)],
+) -> None:
+    """Dependency checking that `/introspect` callers send `INTROSPECTION_CLIENT_SECRET`, when it is set."""
+    secret = settings.INTROSPECTION_CLIENT_SECRET
+    if secret is None:
+        return
+
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(), secret.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid introspection client credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
 @router.post(
     "/register",
     response_model=Token,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(check_rate_limit), Depends(register_admission)],
 )
 @limiter.limit(settings.RATE_LIMIT_REGISTER)
 async def register(
@@ -52,7 +80,11 @@ async def register(
     )
 
 
-@router.post("/login", response_model=Token)
+@router.post(
+    "/login",
+    response_model=Token,
+    dependencies=[Depends(check_rate_limit), Depends(login_admission)],
+)
 @limiter.limit(settings.RATE_LIMIT_LOGIN)
 async def login(
     request: Request,
@@ -85,6 +117,23 @@ async def get_current_user_info(
     return current_user
 
 
+@router.post(
+    "/introspect",
+    response_model=IntrospectionResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(authorize_introspection_client), Depends(check_rate_limit)],
+)
+@limiter.limit(settings.RATE_LIMIT_INTROSPECT)
+async def introspect(
+    request: Request,
+    introspection_request: IntrospectionRequest,
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> IntrospectionResponse:
+    """RFC 7662 style introspection of a batch of tokens, for gateways validating many requests at once."""
+    results = await auth_service.introspect_tokens(session=session, tokens=introspection_request.tokens)
+    return IntrospectionResponse(results=results)
+
+
 @router.get("/refresh", response_model=Token)
 async def refresh(
     refresh_token: Annotated[str, Depends(oauth2_scheme)],
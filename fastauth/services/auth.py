@@ -1,22 +1,25 @@
+import time
 import uuid
 from datetime import UTC, datetime, timedelta
-from typing import Any, cast
+from typing import Any, Literal
 from uuid import UUID
 
 from fastapi import HTTPException, status
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from fastauth.common.metrics import metrics
 from fastauth.common.settings import settings
 from fastauth.db import TokenRepository, UserRepository
-from fastauth.models.schemas import UserLogin, UserRegister
+from fastauth.models.schemas import IntrospectionResult, UserLogin, UserRegister
 from fastauth.models.token import Token, TokenType
 from fastauth.models.user import User
+from fastauth.services.password import UNUSABLE_PASSWORD, PasswordHasher, password_hasher
+from fastauth.services.signing import KeyRing, key_ring
+from fastauth.services.token_cache import TokenCache, token_cache
 
 
 class AuthService:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     auth_fail_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Authentification failed",
@@ -35,22 +38,38 @@ class AuthService:
         self,
         user_repository: UserRepository,
         token_repository: TokenRepository,
+        password_hasher: PasswordHasher = password_hasher,
+        token_cache: TokenCache | None = token_cache if settings.TOKEN_CACHE_ENABLED else None,
+        key_ring: KeyRing = key_ring,
+        access_token_revocation: Literal["row", "epoch"] = settings.ACCESS_TOKEN_REVOCATION,
     ) -> None:
         self.user_repository = user_repository
         self.token_repository = token_repository
+        self.password_hasher = password_hasher
+        self.token_cache = token_cache
+        self.key_ring = key_ring
+        self.access_token_revocation = access_token_revocation
 
-    def _verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return cast(bool, self.pwd_context.verify(plain_password, hashed_password))
+    async def _verify_and_update_password(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        started = time.perf_counter()
+        try:
+            return await self.password_hasher.verify_and_update(plain_password, hashed_password)
+        finally:
+            metrics.password_verify.observe(time.perf_counter() - started)
 
-    def _get_password_hash(self, password: str) -> str:
-        return cast(str, self.pwd_context.hash(password))
+    async def _get_password_hash(self, password: str) -> str:
+        started = time.perf_counter()
+        try:
+            return await self.password_hasher.hash(password)
+        finally:
+            metrics.password_hash.observe(time.perf_counter() - started)
 
     async def create_user(
         self,
         session: AsyncSession,
         user_create: UserRegister,
     ) -> User:
-        hashed_password = self._get_password_hash(user_create.password)
+        hashed_password = await self._get_password_hash(user_create.password)
 
         user = User(
             email=user_create.email,
@@ -73,13 +92,18 @@ class AuthService:
         if user is None:
             raise self.auth_fail_exception
 
-        if not self._verify_password(user_login.password, user.hashed_password):
+        verified, new_hash = await self._verify_and_update_password(user_login.password, user.hashed_password)
+        if not verified:
             raise self.auth_fail_exception
 
+        # The hash predates the current scheme or cost, replace it now that the password is known
+        if new_hash is not None:
+            user = await self.user_repository.update(session, user.id, hashed_password=new_hash)
+
         return user
 
-    @staticmethod
     def _create_token(
+        self,
         data: dict[str, Any],
         expires_delta: timedelta,
     ) -> str:
@@ -87,11 +111,15 @@ class AuthService:
         expire = datetime.now(UTC) + expires_delta
         to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
 
-        return jwt.encode(
-            to_encode,
-            settings.JWT_SECRET_KEY,
-            algorithm=settings.JWT_ALGORITHM,
-        )
+        started = time.perf_counter()
+        encoded = self.key_ring.encode(to_encode)
+        metrics.jwt_encode.observe(time.perf_counter() - started)
+
+        return encoded
+
+    def _checked_by_epoch(self, payload: dict[str, Any]) -> bool:
+        """Whether the access token `payload` is revoked by the user token epoch rather than by its row."""
+        return self.access_token_revocation == "epoch" and payload.get("type") == "access" and "epoch" in payload
 
     async def create_token_for_user(
         self,
@@ -99,7 +127,9 @@ class AuthService:
         user: User,
     ) -> tuple[str, str]:
         access_token_expires = timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token_data = {"sub": str(user.id), "type": "access"}
+        access_token_data: dict[str, Any] = {"sub": str(user.id), "type": "access"}
+        if self.access_token_revocation == "epoch":
+            access_token_data["epoch"] = user.token_epoch
         access_token = self._create_token(access_token_data, access_token_expires)
 
         refresh_token_expires = timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS)
@@ -107,21 +137,22 @@ class AuthService:
         refresh_token = self._create_token(refresh_token_data, refresh_token_expires)
 
         access_token_db = Token(
-            token=access_token,
+            token_hash=Token.hash_token(access_token),
             token_type=TokenType.ACCESS,
             expires_at=datetime.now(UTC) + access_token_expires,
             user_id=user.id,
         )
 
         refresh_token_db = Token(
-            token=refresh_token,
+            token_hash=Token.hash_token(refresh_token),
             token_type=TokenType.REFRESH,
             expires_at=datetime.now(UTC) + refresh_token_expires,
             user_id=user.id,
         )
 
-        await self.token_repository.create(session=session, item=access_token_db)
-        await self.token_repository.create(session=session, item=refresh_token_db)
+        # An epoch-checked access token needs no row, only refresh tokens stay stateful
+        tokens = [refresh_token_db] if "epoch" in access_token_data else [access_token_db, refresh_token_db]
+        await self.token_repository.create_many(session=session, items=tokens)
 
         return access_token, refresh_token
 
@@ -131,39 +162,118 @@ class AuthService:
         token: str,
     ) -> User:
         try:
-            payload = jwt.decode(
-                token,
-                settings.JWT_SECRET_KEY,
-                algorithms=[settings.JWT_ALGORITHM],
-            )
+            started = time.perf_counter()
+            payload = self.key_ring.decode(token)
+            metrics.jwt_decode.observe(time.perf_counter() - started)
 
             sub = payload.get("sub")
-            token_type: str = payload.get("type")
+            token_type = payload.get("type")
 
             if sub is None or token_type != "access":
                 raise self.credentials_exception
 
+            # Epoch-checked tokens only depend on their user, who is cached once for all of them
+            by_epoch = self._checked_by_epoch(payload)
+            cache_key = sub if by_epoch else payload.get("jti")
+
+            if self.token_cache is not None and cache_key is not None:
+                cached_user = self.token_cache.get(cache_key)
+                if cached_user is not None and (not by_epoch or cached_user.token_epoch == payload["epoch"]):
+                    return cached_user
+
             user_id = UUID(sub)
 
-            token_db = await self.token_repository.get_or_none(
-                session=session,
-                token=token,
-                user_id=user_id,
-            )
+            if not by_epoch:
+                token_db = await self.token_repository.get_by_token(
+                    session=session,
+                    token=token,
+                    user_id=user_id,
+                )
 
-            if token_db is None or token_db.is_expired is True or token_db.revoked:
-                raise self.credentials_exception
+                if token_db is None or token_db.is_expired is True or token_db.revoked:
+                    raise self.credentials_exception
 
             user = await self.user_repository.get_or_none(session=session, id=user_id)
 
-            if user is None:
+            if user is None or (by_epoch and user.token_epoch != payload["epoch"]):
                 raise self.credentials_exception
 
+            if self.token_cache is not None and cache_key is not None:
+                self.token_cache.set(cache_key, user, expires_at=payload["exp"])
+
             return user
 
         except JWTError:
             raise self.credentials_exception
 
+    async def introspect_tokens(
+        self,
+        session: AsyncSession,
+        tokens: list[str],
+    ) -> list[IntrospectionResult]:
+        """Introspection result of every token, in order.
+
+        One query reads the stored tokens and one reads the users of the epoch-checked tokens.
+        """
+        payloads: dict[str, dict[str, Any]] = {}
+        for token in set(tokens):
+            try:
+                started = time.perf_counter()
+                payloads[token] = self.key_ring.decode(token)
+                metrics.jwt_decode.observe(time.perf_counter() - started)
+            except JWTError:
+                continue
+
+        # Epoch-checked tokens resolve through their user, the others through their row
+        by_epoch: dict[str, UUID] = {}
+        for token, payload in list(payloads.items()):
+            if self._checked_by_epoch(payload):
+                try:
+                    by_epoch[token] = UUID(payload.get("sub"))
+                except (TypeError, ValueError):
+                    del payloads[token]
+
+        token_hashes = {token: Token.hash_token(token) for token in payloads if token not in by_epoch}
+        live = await self.token_repository.get_live_with_users(
+            session=session,
+            token_hashes=list(token_hashes.values()),
+        )
+        users = await self.user_repository.get_by_ids(session=session, ids=list(set(by_epoch.values())))
+
+        inactive = IntrospectionResult(active=False)
+        results = []
+        for token in tokens:
+            payload = payloads.get(token)
+            if payload is None:
+                results.append(inactive)
+                continue
+
+            if token in by_epoch:
+                user = users.get(by_epoch[token])
+                if user is None or user.token_epoch != payload["epoch"]:
+                    results.append(inactive)
+                    continue
+            else:
+                row = live.get(token_hashes[token])
+                if row is None or str(row[0].user_id) != payload.get("sub"):
+                    results.append(inactive)
+                    continue
+
+                user = row[1]
+
+            results.append(
+                IntrospectionResult(
+                    active=True,
+                    sub=payload["sub"],
+                    username=user.username,
+                    token_type=payload.get("type"),
+                    exp=payload.get("exp"),
+                    jti=payload.get("jti"),
+                )
+            )
+
+        return results
+
     async def create_or_update_oauth2_user(
         self,
         session: AsyncSession,
@@ -172,39 +282,16 @@ class AuthService:
         email: str,
         username: str,
     ) -> User:
-        user = await self.user_repository.get_or_none(
-            session=session,
-            oauth_provider=provider,
-            oauth_id=provider_id,
-        )
-
-        if user is None:
-            user = await self.user_repository.get_or_none(
-                session=session,
-                email=email,
-            )
-
-        if user is not None:
-            await self.user_repository.update(
-                session=session,
-                id_=user.id,
-                oauth_provider=provider,
-                oauth_id=provider_id,
-            )
-            return user
-
-        random_password = uuid.uuid4().hex
-        hashed_password = self._get_password_hash(random_password)
-
+        # New users have no password, they can only log in through the provider
         user = User(
             email=email,
             username=username,
-            hashed_password=hashed_password,
+            hashed_password=UNUSABLE_PASSWORD,
             oauth_provider=provider,
             oauth_id=provider_id,
         )
 
-        return await self.user_repository.create(session=session, item=user)
+        return await self.user_repository.upsert_oauth_user(session=session, user=user)
 
     async def revoke_tokens_for_user(
         self,
@@ -212,30 +299,26 @@ class AuthService:
         user_id: UUID,
     ) -> None:
         await self.token_repository.revoke_all_for_user(session=session, user_id=user_id)
+        # Also in row mode, so that switching to epoch mode cannot revive access tokens issued before
+        await self.user_repository.bump_token_epoch(session=session, user_id=user_id)
+
+        if self.token_cache is not None:
+            # Evicted before the commit, a concurrent request could read the old epoch and cache the user again
+            await session.commit()
+            self.token_cache.evict_user(user_id)
 
     async def refresh_token(
         self,
         session: AsyncSession,
         refresh_token: str,
     ) -> tuple[str, str]:
-        refresh_token_db = await self.token_repository.get_or_none(
-            session=session,
-            token=refresh_token,
-            token_type=TokenType.REFRESH,
-        )
-
-        if refresh_token_db is None or refresh_token_db.is_expired is True or refresh_token_db.revoked:
-            raise self.refresh_token_exception
-
-        if refresh_token_db.id is None:
-            raise ValueError
-
-        user = await self.user_repository.get_or_none(session=session, id=refresh_token_db.user_id)
+        user = await self.token_repository.rotate_refresh_token(session=session, token=refresh_token)
 
         if user is None:
             raise self.refresh_token_exception
 
-        await self.token_repository.update(session, refresh_token_db.id, revoked=True)
+        if self.token_cache is not None:
+            self.token_cache.evict_user(user.id)
 
         return await self.create_token_for_user(session=session, user=user)
 
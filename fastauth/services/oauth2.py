@@ -1,19 +1,91 @@
+import logging
+import time
+from types import TracebackType
+from typing import Any
+
+import httpx
 from authlib.integrations.starlette_client import OAuth
 from fastapi import Request
 
+from fastauth.common.periodic import PeriodicTask
 from fastauth.common.settings import settings
 from fastauth.models.schemas import GoogleUserInfo
 
+logger = logging.getLogger(__name__)
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Keep-alive connection pool shared by every HTTP client authlib opens.
+
+    Authlib builds a new client for each OAuth2 flow and closes it, with its transport, when the flow
+    ends. Closing this transport is a no-op so connections outlive the flows, `shutdown` closes them.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport | None = None) -> None:
+        self._transport = transport if transport is not None else httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport.handle_async_request(request)
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None = None,
+        exc_value: BaseException | None = None,
+        traceback: TracebackType | None = None,
+    ) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        await self._transport.aclose()
+
+
+class OpenIDMetadataRefresher(PeriodicTask):
+    """Loads the discovery document and signing keys of an OpenID provider every `interval` seconds.
+
+    They are stored where authlib looks for them, so authorization flows never fetch them on the
+    callback path. Authlib still refetches the keys itself when an ID token is signed by an unknown key.
+    """
+
+    name = "openid_metadata_refresher"
+
+    def __init__(self, client: Any, metadata_url: str, transport: httpx.AsyncBaseTransport, interval: float) -> None:
+        super().__init__(interval=interval)
+        self.client = client
+        self.metadata_url = metadata_url
+        self.transport = transport
+        self.loaded_at: float | None = None
+
+    async def run_once(self) -> None:
+        async with httpx.AsyncClient(transport=self.transport) as http_client:
+            response = await http_client.get(self.metadata_url)
+            response.raise_for_status()
+            metadata = response.json()
+
+            response = await http_client.get(metadata["jwks_uri"])
+            response.raise_for_status()
+            metadata["jwks"] = response.json()
+
+        self.loaded_at = metadata["_loaded_at"] = time.time()
+        self.client.server_metadata.update(metadata)
+        logger.debug("Loaded OpenID metadata of %s", metadata.get("issuer"))
+
+
+http_transport = SharedTransport()
+
 oauth = OAuth()
 
 oauth.register(
     name="google",
     client_id=settings.GOOGLE_CLIENT_ID,
     client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+    server_metadata_url=settings.GOOGLE_SERVER_METADATA_URL,
     client_kwargs={
         "scope": "openid email profile",
         "redirect_uri": settings.GOOGLE_REDIRECT_URI,
+        "transport": http_transport,
     },
 )
 
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Literal, cast
+
+from passlib.context import CryptContext
+
+from fastauth.common.exceptions import HashingUnavailableException
+from fastauth.common.settings import settings
+
+logger = logging.getLogger(__name__)
+
+type PasswordScheme = Literal["bcrypt", "argon2"]
+
+SCHEMES: tuple[PasswordScheme, ...] = ("bcrypt", "argon2")
+
+# Cost bounds explored by `calibrate_cost`: bcrypt log2 rounds, argon2 time cost (passes over memory).
+# The lower bounds are the passlib defaults, so a calibrated cost is never weaker than an uncalibrated one
+MIN_COST: dict[PasswordScheme, int] = {"bcrypt": 12, "argon2": 3}
+MAX_COST: dict[PasswordScheme, int] = {"bcrypt": 16, "argon2": 10}
+
+# Stored instead of a hash for users without a password (OAuth only), no password verifies against it
+UNUSABLE_PASSWORD = "!"
+
+# Context used inside the executor workers, set by `_init_worker`
+_worker_context: CryptContext | None = None
+
+
+def _init_worker(context_config: str) -> None:
+    global _worker_context
+    _worker_context = CryptContext.from_string(context_config)
+
+
+def _hash(password: str) -> str:
+    return cast(str, cast(CryptContext, _worker_context).hash(password))
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return cast(bool, cast(CryptContext, _worker_context).verify(password, hashed_password))
+
+
+def _verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return cast(
+        tuple[bool, str | None], cast(CryptContext, _worker_context).verify_and_update(password, hashed_password)
+    )
+
+
+def build_context(
+    scheme: PasswordScheme,
+    cost: int | None = None,
+    argon2_memory_cost: int = 65_536,
+    argon2_parallelism: int = 1,
+) -> CryptContext:
+    """Context hashing with `scheme` at `cost`, or the passlib default cost when None.
+
+    Hashes of the other scheme, or below `cost`, still verify but are flagged by `needs_update`.
+    Argon2 needs the `argon2` extra.
+    """
+    config: dict[str, Any] = {}
+    if cost is not None:
+        config.update({f"{scheme}__default_rounds": cost, f"{scheme}__min_rounds": cost})
+    if scheme == "argon2":
+        config.update(argon2__memory_cost=argon2_memory_cost, argon2__parallelism=argon2_parallelism)
+
+    schemes = [scheme, *(other for other in SCHEMES if other != scheme)]
+    return CryptContext(schemes=schemes, deprecated="auto", **config)
+
+
+def _time_hash(context: CryptContext) -> float:
+    started = time.perf_counter()
+    context.hash("calibration")
+    return time.perf_counter() - started
+
+
+def calibrate_cost(
+    scheme: PasswordScheme,
+    target: float,
+    argon2_memory_cost: int = 65_536,
+    argon2_parallelism: int = 1,
+    min_cost: int | None = None,
+    samples: int = 3,
+) -> int:
+    """Highest cost whose hash takes at most `target` seconds on this machine, never below `min_cost`.
+
+    `min_cost` defaults to `MIN_COST`. Logins only rehash upwards, so a cost picked too low would stay
+    in every hash created meanwhile: each cost is timed by the fastest of `samples` hashes, so that
+    one slow sample on a loaded host does not stop the search early.
+    Blocking, the whole run takes about `samples` times twice the target.
+    """
+    best = MIN_COST[scheme] if min_cost is None else min_cost
+    # Loads the backend, so that it is not timed
+    build_context(scheme, best, argon2_memory_cost, argon2_parallelism).hash("calibration")
+
+    for cost in range(best, MAX_COST[scheme] + 1):
+        context = build_context(scheme, cost, argon2_memory_cost, argon2_parallelism)
+        elapsed = min(_time_hash(context) for _ in range(samples))
+        if elapsed > target:
+            break
+
+        best = cost
+
+    logger.info("Password hashing calibrated to %s cost %d for a %.0f ms target", scheme, best, target * 1000)
+    return best
+
+
+class PasswordHasher:
+    """Run password hashing on a bounded worker pool, off the event loop.
+
+    At most `max_workers` hashes run at the same time and at most `queue_size` more wait for a worker.
+    Any call beyond that raises `HashingUnavailableException` instead of queueing.
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        executor_type: Literal["thread", "process"] = "thread",
+        max_workers: int = 4,
+        queue_size: int = 32,
+    ) -> None:
+        self.context = context
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor: Executor | None = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.executor_type == "process" else ThreadPoolExecutor
+            self._executor = executor_class(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.context.to_string(),),
+            )
+
+        return self._executor
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self._in_flight >= self.max_workers + self.queue_size:
+            raise HashingUnavailableException("Too many password hashing operations in progress")
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return cast(str, await self._run(_hash, password))
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        if hashed_password.startswith(UNUSABLE_PASSWORD):
+            return False
+
+        return cast(bool, await self._run(_verify, password, hashed_password))
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Verify `password` and, when its hash needs an update, also return a new hash of it."""
+        if hashed_password.startswith(UNUSABLE_PASSWORD):
+            return False, None
+
+        return cast(tuple[bool, str | None], await self._run(_verify_and_update, password, hashed_password))
+
+    def configure(self, context: CryptContext) -> None:
+        """Hash with `context` from now on, workers are restarted to pick it up."""
+        self.shutdown()
+        self.context = context
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    context=build_context(
+        scheme=settings.PASSWORD_HASH_SCHEME,
+        cost=settings.PASSWORD_HASH_COST,
+        argon2_memory_cost=settings.PASSWORD_HASH_ARGON2_MEMORY_KIB,
+        argon2_parallelism=settings.PASSWORD_HASH_ARGON2_PARALLELISM,
+    ),
+    executor_type=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+)
@@ -0,0 +1,134 @@
+"""JWT signing keys, loaded once at import and kept as key objects.
+
+With an HMAC algorithm (the default HS256) tokens are signed with `JWT_SECRET_KEY` and carry no `kid`,
+so only this service can verify them. With RS256 or ES256 (or their 384 and 512 variants) every
+`<kid>.pem` file of `JWT_SIGNING_KEYS_DIR` is loaded: the key named by `JWT_SIGNING_KEY_ID` signs, and
+all of them verify and are published on `/.well-known/jwks.json` for other services to verify offline.
+
+Rotating without rejecting valid tokens:
+
+1. Add the new private key next to the current one, keeping `JWT_SIGNING_KEY_ID`, and deploy so the key
+   set announces it.
+2. Once consumers had time to refresh their cached key set, point `JWT_SIGNING_KEY_ID` at it.
+3. After the refresh token lifetime, delete the old key, or replace it with its public key only.
+"""
+
+import json
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from jose.constants import ALGORITHMS
+
+from fastauth.common.settings import settings
+
+# Key class and curve each asymmetric algorithm expects, python-jose does not check them itself
+KEY_TYPES: dict[str, tuple[type, type[ec.EllipticCurve] | None]] = {
+    **{algorithm: (rsa.RSAPublicKey, None) for algorithm in ALGORITHMS.RSA_DS},
+    ALGORITHMS.ES256: (ec.EllipticCurvePublicKey, ec.SECP256R1),
+    ALGORITHMS.ES384: (ec.EllipticCurvePublicKey, ec.SECP384R1),
+    ALGORITHMS.ES512: (ec.EllipticCurvePublicKey, ec.SECP521R1),
+}
+
+
+def _load_key(path: Path, algorithm: str) -> Key:
+    """Private or public PEM key of `path` for `algorithm`."""
+    data = path.read_bytes()
+    if b"PRIVATE KEY" in data:
+        public_key = serialization.load_pem_private_key(data, password=None).public_key()
+    else:
+        public_key = serialization.load_pem_public_key(data)
+
+    key_class, curve = KEY_TYPES[algorithm]
+    if not isinstance(public_key, key_class) or (
+        curve is not None and not isinstance(getattr(public_key, "curve", None), curve)
+    ):
+        raise ValueError(f"JWT key {path} does not match {algorithm}")
+
+    return jwk.construct(data, algorithm)
+
+
+class KeyRing:
+    """Keys verifying tokens by `kid`, one of which signs.
+
+    The key without id (None) is the HMAC secret, it is never published.
+    """
+
+    def __init__(self, algorithm: str, keys: dict[str | None, Key], signing_key_id: str | None) -> None:
+        if signing_key_id not in keys:
+            raise ValueError(f"Unknown JWT signing key {signing_key_id!r}, expected one of {sorted(map(str, keys))}")
+
+        signing_key = keys[signing_key_id]
+        if algorithm not in ALGORITHMS.HMAC and "d" not in signing_key.to_dict():
+            raise ValueError(f"JWT signing key {signing_key_id!r} is a public key")
+
+        self.algorithm = algorithm
+        self.signing_key_id = signing_key_id
+        self._signing_key = signing_key
+        self._headers = {"kid": signing_key_id} if signing_key_id is not None else None
+        # Private EC key objects cannot verify, asymmetric keys verify through their public half
+        self._verifying_keys = {
+            kid: key if algorithm in ALGORITHMS.HMAC else key.public_key() for kid, key in keys.items()
+        }
+
+        public_keys = [
+            {**key.to_dict(), "kid": kid, "use": "sig"} for kid, key in self._verifying_keys.items() if kid is not None
+        ]
+        # Serialized once, the key set only changes on restart
+        self.jwks = json.dumps({"keys": public_keys}).encode()
+
+    @classmethod
+    def from_secret(cls, secret: str, algorithm: str) -> "KeyRing":
+        if algorithm not in ALGORITHMS.HMAC:
+            raise ValueError(f"{algorithm} is not an HMAC algorithm")
+
+        return cls(algorithm, {None: jwk.construct(secret, algorithm)}, signing_key_id=None)
+
+    @classmethod
+    def from_directory(cls, directory: str | Path, algorithm: str, signing_key_id: str | None = None) -> "KeyRing":
+        """Every `<kid>.pem` file of `directory`, signing with `signing_key_id`, optional for a single key."""
+        if algorithm not in KEY_TYPES:
+            raise ValueError(
+                f"Unsupported JWT algorithm {algorithm!r}, expected one of {', '.join(sorted(KEY_TYPES))} "
+                f"or {', '.join(sorted(ALGORITHMS.HMAC))} with JWT_SECRET_KEY"
+            )
+
+        keys: dict[str | None, Key] = {
+            path.stem: _load_key(path, algorithm) for path in sorted(Path(directory).glob("*.pem"))
+        }
+        if not keys:
+            raise ValueError(f"No JWT signing key in {directory}")
+        if signing_key_id is None:
+            if len(keys) > 1:
+                raise ValueError(f"Several JWT keys in {directory}, pick the signing one with JWT_SIGNING_KEY_ID")
+            signing_key_id = next(iter(keys))
+
+        return cls(algorithm, keys, signing_key_id)
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        return jwt.encode(claims, self._signing_key, algorithm=self.algorithm, headers=self._headers)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        """Verified claims of `token`, signed by any key of the ring. Raises `JWTError`."""
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self._verifying_keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown signing key")
+
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+def _build_key_ring() -> KeyRing:
+    if settings.JWT_ALGORITHM in ALGORITHMS.HMAC:
+        return KeyRing.from_secret(settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM)
+
+    if settings.JWT_SIGNING_KEYS_DIR is None:
+        raise ValueError(f"JWT_SIGNING_KEYS_DIR is required with {settings.JWT_ALGORITHM}")
+
+    return KeyRing.from_directory(settings.JWT_SIGNING_KEYS_DIR, settings.JWT_ALGORITHM, settings.JWT_SIGNING_KEY_ID)
+
+
+key_ring = _build_key_ring()
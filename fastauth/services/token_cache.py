@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from typing import Any
+from uuid import UUID
+
+from fastauth.common.settings import settings
+from fastauth.models.user import User
+
+
+class TokenCache:
+    """Bounded LRU cache of verified access tokens, keyed by `jti`.
+
+    Each entry holds a detached snapshot of the user the token resolved to, and lives until the
+    token `exp` or `max_ttl` seconds, whichever comes first. The cache is per process: a token
+    revoked by another worker stays valid here for at most `max_ttl` seconds.
+    """
+
+    def __init__(self, max_size: int, max_ttl: float) -> None:
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries: OrderedDict[str, tuple[float, User]] = OrderedDict()
+        self._jtis_by_user: dict[UUID, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, jti: str) -> User | None:
+        entry = self._entries.get(jti)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        deadline, user = entry
+        if deadline <= time.monotonic():
+            self._remove(jti)
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(jti)
+        self.hits += 1
+        return user
+
+    def set(self, jti: str, user: User, expires_at: float) -> None:
+        """Cache `user` for `jti` until the unix timestamp `expires_at`, bounded by `max_ttl`."""
+        ttl = min(expires_at - time.time(), self.max_ttl)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        self._remove(jti)
+        self._entries[jti] = (time.monotonic() + ttl, User.model_validate(user.model_dump()))
+        self._jtis_by_user.setdefault(user.id, set()).add(jti)
+
+        while len(self._entries) > self.max_size:
+            oldest_jti = next(iter(self._entries))
+            self._remove(oldest_jti)
+            self.evictions += 1
+
+    def evict_user(self, user_id: UUID) -> None:
+        for jti in self._jtis_by_user.pop(user_id, set()):
+            if self._entries.pop(jti, None) is not None:
+                self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._jtis_by_user.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, jti: str) -> None:
+        entry = self._entries.pop(jti, None)
+        if entry is None:
+            return
+
+        user_id = entry[1].id
+        jtis = self._jtis_by_user.get(user_id)
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._jtis_by_user[user_id]
+
+
+token_cache = TokenCache(
+    max_size=settings.TOKEN_CACHE_MAX_SIZE,
+    max_ttl=settings.TOKEN_CACHE_MAX_TTL_SECONDS,
+)
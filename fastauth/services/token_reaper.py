@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from fastauth.common.periodic import PeriodicTask
+from fastauth.db import TokenRepository
+from fastauth.db.database import on_primary
+
+logger = logging.getLogger(__name__)
+
+# Taken by each batch, so that the reapers of several workers never delete the same rows at once
+LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('fastauth.tokens.reaper'))"
+
+
+class TokenReaper(PeriodicTask):
+    """Background task deleting expired and revoked tokens in bounded batches.
+
+    Each batch runs in its own short transaction, so a large backlog never holds locks for long,
+    and the reaper sleeps between batches to leave room for request traffic.
+    With `include_expired=False` only revoked tokens are deleted, expired ones being left to partition drops.
+    On Postgres each batch takes a transaction-level advisory lock in its own transaction, so that it
+    needs no extra connection, and a run finding it taken by the reaper of another worker or replica stops.
+    """
+
+    name = "token-reaper"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        token_repository: TokenRepository,
+        interval: float,
+        batch_size: int,
+        batch_sleep: float,
+        include_expired: bool = True,
+    ) -> None:
+        super().__init__(interval=interval)
+        self.session_factory = session_factory
+        self.token_repository = token_repository
+        self.batch_size = batch_size
+        self.batch_sleep = batch_sleep
+        self.include_expired = include_expired
+        self.runs = 0
+        self.total_removed = 0
+        self.last_run_removed: int | None = None
+        self.last_run_at: datetime | None = None
+
+    async def run_once(self) -> int:
+        """Delete batches until one comes back short, and return the number of rows removed."""
+        removed = 0
+
+        while True:
+            async with self.session_factory() as session:
+                if not await self._try_lock(session):
+                    logger.info("Token reaper of another worker is running, stopping this run")
+                    break
+
+                batch_removed = await self.token_repository.delete_expired_batch(
+                    session=session,
+                    batch_size=self.batch_size,
+                    include_expired=self.include_expired,
+                )
+                await session.commit()
+
+            removed += batch_removed
+            if batch_removed < self.batch_size:
+                break
+
+            await asyncio.sleep(self.batch_sleep)
+
+        self.runs += 1
+        self.total_removed += removed
+        self.last_run_removed = removed
+        self.last_run_at = datetime.now(UTC)
+        logger.info("Token reaper removed %d expired or revoked tokens", removed)
+
+        return removed
+
+    @staticmethod
+    async def _try_lock(session: AsyncSession) -> bool:
+        if session.get_bind().dialect.name != "postgresql":
+            return True
+
+        with on_primary(session):
+            return bool(await session.scalar(text(LOCK_SQL)))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "total_removed": self.total_removed,
+            "last_run_removed": self.last_run_removed,
+            "last_run_at": self.last_run_at,
+        }
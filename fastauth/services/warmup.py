@@ -0,0 +1,130 @@
+"""Warm-up run by the lifespan before a worker reports ready on `/ready`.
+
+The first requests of a cold worker open database connections, start the password hashing
+workers, load the JWT backends and compile every SQL statement on the way. The warm-up pays for
+all of it before the worker serves: it opens pool connections, hashes and verifies a throwaway
+password on every hashing worker, signs and verifies a token and sends each read-only route one
+request in process, with rate limiting off. No row is written.
+"""
+
+import asyncio
+import logging
+import secrets
+import uuid
+from contextlib import AsyncExitStack
+from datetime import UTC, datetime, timedelta
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import QueuePool, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from fastauth.common.rate_limit import limiter
+from fastauth.common.settings import settings
+from fastauth.common.startup import startup_timer
+from fastauth.services.password import PasswordHasher, password_hasher
+from fastauth.services.signing import KeyRing, key_ring
+
+logger = logging.getLogger(__name__)
+
+
+async def open_connections(engine: AsyncEngine, count: int) -> int:
+    """Check out `count` connections at once, capped at the pool size, and return them to the pool open."""
+    if isinstance(engine.pool, QueuePool):
+        count = min(count, engine.pool.size())
+
+    async with AsyncExitStack() as stack:
+
+        async def checkout() -> None:
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(text("SELECT 1"))
+
+        await asyncio.gather(*(checkout() for _ in range(count)))
+
+    return count
+
+
+async def prime_password_hashing(hasher: PasswordHasher) -> None:
+    """Hash a throwaway password, then verify it on every worker so that all of them are started."""
+    password = secrets.token_urlsafe()
+    hashed_password = await hasher.hash(password)
+    await asyncio.gather(*(hasher.verify(password, hashed_password) for _ in range(hasher.max_workers)))
+
+
+def _warmup_token(ring: KeyRing, token_type: str) -> str:
+    # Signed by the current key for a user that does not exist, so it never authenticates
+    return ring.encode(
+        {
+            "sub": str(uuid.uuid4()),
+            "type": token_type,
+            "exp": datetime.now(UTC) + timedelta(minutes=1),
+            "jti": uuid.uuid4().hex,
+        }
+    )
+
+
+def prime_jwt(ring: KeyRing) -> None:
+    ring.decode(_warmup_token(ring, "access"))
+
+
+async def exercise_routes(app: FastAPI, ring: KeyRing) -> dict[str, int]:
+    """Send each read-only route one request in process and return the status code of each."""
+    auth_prefix = f"{settings.API_PREFIX}/auth"
+    access_token = _warmup_token(ring, "access")
+    refresh_token = _warmup_token(ring, "refresh")
+
+    statuses: dict[str, int] = {}
+    limiter_enabled = limiter.enabled
+    limiter.enabled = False
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+            requests = [
+                client.build_request("GET", "/"),
+                client.build_request("GET", "/.well-known/jwks.json"),
+                client.build_request("GET", f"{auth_prefix}/me", headers={"Authorization": f"Bearer {access_token}"}),
+                client.build_request(
+                    "GET", f"{auth_prefix}/refresh", headers={"Authorization": f"Bearer {refresh_token}"}
+                ),
+                client.build_request("POST", f"{auth_prefix}/introspect", json={"tokens": [access_token]}),
+                client.build_request(
+                    "POST",
+                    f"{auth_prefix}/login",
+                    data={"username": f"warmup-{uuid.uuid4().hex}", "password": "warmup"},
+                ),
+            ]
+            for request in requests:
+                response = await client.send(request)
+                statuses[f"{request.method} {request.url.path}"] = response.status_code
+    finally:
+        limiter.enabled = limiter_enabled
+
+    return statuses
+
+
+async def warm_up(app: FastAPI, engines: list[AsyncEngine], min_connections: int, timeout: float) -> bool:
+    """Run every warm-up step within `timeout` seconds, return whether all of them succeeded.
+
+    `min_connections` connections are opened on each of `engines`, the primary and the read replica.
+
+    A failed step is logged and the worker starts cold rather than not at all.
+    """
+    try:
+        async with asyncio.timeout(timeout):
+            with startup_timer.phase("warmup_connections"):
+                await asyncio.gather(*(open_connections(engine, min_connections) for engine in engines))
+            with startup_timer.phase("warmup_password_hashing"):
+                await prime_password_hashing(password_hasher)
+            with startup_timer.phase("warmup_jwt"):
+                prime_jwt(key_ring)
+            with startup_timer.phase("warmup_routes"):
+                statuses = await exercise_routes(app, key_ring)
+    except Exception:
+        logger.exception("Warm-up failed, the worker starts cold")
+        return False
+
+    failed = {route: status for route, status in statuses.items() if status >= 500}
+    if failed:
+        logger.warning("Warm-up requests failed: %s", failed)
+
+    return not failed
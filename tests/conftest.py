@@ -1,8 +1,10 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Iterator
+from typing import Any
 
 import pytest
 from faker import Faker
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.asyncio.session import AsyncSession
@@ -42,6 +44,50 @@ async def session(engine: AsyncEngine) -> AsyncGenerator[AsyncSession, None]:
         await session.rollback()
 
 
+class QueryPlans:
+    """Statements run on an engine, explained afterwards to find the ones reading a whole table.
+
+    On Postgres sequential scans are disabled while explaining, so any left has no usable index.
+    Inserts are not recorded, they read nothing.
+    """
+
+    def __init__(self) -> None:
+        self.statements: list[tuple[str, Any]] = []
+
+    def record(self, _conn: Any, _cursor: Any, statement: str, parameters: Any, *_args: Any) -> None:
+        if not statement.lstrip().upper().startswith("INSERT"):
+            self.statements.append((statement, parameters))
+
+    async def full_scans(self, session: AsyncSession) -> list[str]:
+        """Plan lines scanning a whole table, for every recorded statement."""
+        self.statements, statements = [], self.statements
+        connection = await session.connection()
+        tables = SQLModel.metadata.tables
+        full_scans = []
+
+        if connection.dialect.name == "postgresql":
+            await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            for statement, parameters in statements:
+                plan = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                full_scans += [line for line in plan.scalars() if "Seq Scan" in line]
+            return full_scans
+
+        for statement, parameters in statements:
+            plan = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            # A bare "SCAN <table>" reads every row, "SEARCH <table> USING ..." and index scans do not
+            full_scans += [detail for *_, detail in plan if detail.startswith("SCAN ") and detail[5:] in tables]
+
+        return full_scans
+
+
+@pytest.fixture
+def query_plans(engine: AsyncEngine) -> Iterator[QueryPlans]:
+    query_plans = QueryPlans()
+    event.listen(engine.sync_engine, "before_cursor_execute", query_plans.record)
+    yield query_plans
+    event.remove(engine.sync_engine, "before_cursor_execute", query_plans.record)
+
+
 @pytest.fixture
 async def client(engine: AsyncEngine) -> AsyncGenerator[AsyncClient, None]:
     async_session_factory = async_sessionmaker(
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from fastauth.common.admission import AdmissionLimiter, login_admission
+from fastauth.common.exceptions import AdmissionRejectedException
+
+API_PREFIX = "/api/v1/auth"
+
+
+class TestAdmissionLimiter:
+    async def test_queues_within_budget_and_rejects_beyond(self) -> None:
+        # Given
+        limiter = AdmissionLimiter("login", max_concurrency=1, max_queue=1, queue_timeout=1)
+        release = asyncio.Event()
+
+        async def hold() -> None:
+            async with limiter.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        # When
+        with pytest.raises(AdmissionRejectedException):
+            async with limiter.admit():
+                pass
+        stats = limiter.stats()
+        release.set()
+        await asyncio.gather(holder, queued)
+
+        # Then
+        assert stats["active"] == 1
+        assert stats["queued"] == 1
+        assert limiter.stats() == {
+            "active": 0,
+            "queued": 0,
+            "admitted": 2,
+            "rejected": 1,
+            "max_concurrency": 1,
+            "max_queue": 1,
+        }
+
+    async def test_rejects_after_queue_timeout(self) -> None:
+        # Given
+        limiter = AdmissionLimiter("register", max_concurrency=1, max_queue=1, queue_timeout=0.01)
+
+        # When
+        async with limiter.admit():
+            with pytest.raises(AdmissionRejectedException):
+                async with limiter.admit():
+                    pass
+
+        # Then
+        assert limiter.stats()["rejected"] == 1
+        assert limiter.stats()["queued"] == 0
+
+
+class TestAdmissionControl:
+    async def test_saturated_login_returns_503_and_leaves_other_routes(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        monkeypatch.setattr(login_admission, "_semaphore", asyncio.Semaphore(0))
+        monkeypatch.setattr(login_admission, "max_queue", 0)
+
+        # When
+        response = await client.post(f"{API_PREFIX}/login", data={"username": "username", "password": "password"})
+
+        # Then
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert (await client.get("/stats")).json()["admission"]["login"]["rejected"] >= 1
+        assert (await client.get(f"{API_PREFIX}/me")).status_code == 401
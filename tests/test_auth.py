@@ -1,5 +1,29 @@
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+from uuid import UUID
+
+import limits.storage.memory
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
 from faker import Faker
 from httpx import AsyncClient
+from jose import jwt
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from fastauth.common import rate_limit
+from fastauth.common.settings import settings
+from fastauth.db import UserRepository
+from fastauth.models import Token, User
+from fastauth.models.token import TokenType
+from fastauth.routers import auth as auth_router
+from fastauth.services.password import build_context, password_hasher
+from fastauth.services.signing import KeyRing
+from fastauth.services.token_cache import TokenCache
 
 fake = Faker()
 
@@ -106,6 +130,23 @@ class TestRegister:
         # Then
         assert response.status_code == 422
 
+    async def test_register_returns_503_when_hashing_pool_is_saturated(
+        self,
+        client: AsyncClient,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        # Given
+        monkeypatch.setattr(password_hasher, "max_workers", 0)
+        monkeypatch.setattr(password_hasher, "queue_size", 0)
+        payload = {"email": fake.email(), "username": fake.user_name(), "password": fake.password(length=12)}
+
+        # When
+        response = await client.post(f"{API_PREFIX}/register", json=payload)
+
+        # Then
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
 
 class TestLogin:
     async def test_login_success(self, client: AsyncClient) -> None:
@@ -130,6 +171,37 @@ class TestLogin:
         assert "refresh_token" in data
         assert data["token_type"] == "bearer"
 
+    async def test_login_rehashes_outdated_password_hash(
+        self,
+        client: AsyncClient,
+        session: AsyncSession,
+    ) -> None:
+        # Given
+        username = fake.user_name()
+        password = fake.password(length=12)
+        context = password_hasher.context
+        password_hasher.configure(build_context("bcrypt", cost=4))
+        try:
+            await client.post(
+                f"{API_PREFIX}/register",
+                json={"email": fake.email(), "username": username, "password": password},
+            )
+            password_hasher.configure(build_context("bcrypt", cost=5))
+
+            # When
+            response = await client.post(
+                f"{API_PREFIX}/login",
+                data={"username": username, "password": password},
+            )
+        finally:
+            password_hasher.configure(context)
+
+        # Then
+        assert response.status_code == 200
+        user = await UserRepository().get_or_none(session, username=username)
+        assert user is not None
+        assert user.hashed_password.startswith("$2b$05$")
+
     async def test_login_wrong_password(self, client: AsyncClient) -> None:
         # Given
         username = fake.user_name()
@@ -212,6 +284,79 @@ class TestMe:
         # Then
         assert response.status_code == 401
 
+    async def test_me_is_served_from_token_cache(self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        monkeypatch.setattr(auth_router.auth_service, "token_cache", cache)
+        user_data = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {user_data['access_token']}"}
+        await client.get(f"{API_PREFIX}/me", headers=headers)
+
+        # When
+        response = await client.get(f"{API_PREFIX}/me", headers=headers)
+
+        # Then
+        assert response.status_code == 200
+        assert response.json()["username"] == user_data["username"]
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    async def test_logout_evicts_token_cache(self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        monkeypatch.setattr(auth_router.auth_service, "token_cache", cache)
+        user_data = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {user_data['access_token']}"}
+        await client.post(f"{API_PREFIX}/logout", headers=headers)
+
+        # When
+        response = await client.get(f"{API_PREFIX}/me", headers=headers)
+
+        # Then
+        assert response.status_code == 401
+        assert len(cache) == 0
+
+    async def test_logout_evicts_token_cache_after_commit(
+        self, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        monkeypatch.setattr(auth_router.auth_service, "token_cache", cache)
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+        in_transaction_at_eviction = []
+        monkeypatch.setattr(
+            cache, "evict_user", lambda _user_id: in_transaction_at_eviction.append(session.in_transaction())
+        )
+
+        # When
+        await auth_router.auth_service.revoke_tokens_for_user(session=session, user_id=user.id)
+
+        # Then
+        assert in_transaction_at_eviction == [False]
+
+    async def test_me_with_asymmetric_token(
+        self, client: AsyncClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        (tmp_path / "2026-10.pem").write_bytes(pem)
+        monkeypatch.setattr(auth_router.auth_service, "key_ring", KeyRing.from_directory(tmp_path, "ES256"))
+        user_data = await register_and_login(client)
+
+        # When
+        response = await client.get(
+            f"{API_PREFIX}/me", headers={"Authorization": f"Bearer {user_data['access_token']}"}
+        )
+
+        # Then
+        assert response.status_code == 200
+        assert jwt.get_unverified_header(user_data["access_token"])["kid"] == "2026-10"
+
 
 class TestRefresh:
     async def test_refresh_success_with_rotation(self, client: AsyncClient) -> None:
@@ -322,6 +467,125 @@ class TestLogout:
         assert response.status_code == 401
 
 
+class TestIntrospect:
+    async def test_introspect_resolves_batch_in_order(self, client: AsyncClient) -> None:
+        # Given
+        user_data = await register_and_login(client)
+        revoked_data = await register_and_login(client)
+        await client.post(f"{API_PREFIX}/logout", headers={"Authorization": f"Bearer {revoked_data['access_token']}"})
+        tokens = [user_data["access_token"], revoked_data["access_token"], "invalid-token", user_data["refresh_token"]]
+
+        # When
+        response = await client.post(f"{API_PREFIX}/introspect", json={"tokens": tokens})
+
+        # Then
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["active"] for result in results] == [True, False, False, True]
+        assert results[0]["username"] == user_data["username"]
+        assert results[0]["token_type"] == "access"
+        assert results[1] == {"active": False}
+        assert results[3]["token_type"] == "refresh"
+
+    async def test_introspect_rejects_batch_over_limit(self, client: AsyncClient) -> None:
+        # Given
+        tokens = ["invalid-token"] * (settings.INTROSPECTION_MAX_BATCH_SIZE + 1)
+
+        # When
+        response = await client.post(f"{API_PREFIX}/introspect", json={"tokens": tokens})
+
+        # Then
+        assert response.status_code == 422
+
+    async def test_introspect_requires_client_secret_when_set(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        monkeypatch.setattr(settings, "INTROSPECTION_CLIENT_SECRET", "gateway-secret")
+        body = {"tokens": ["invalid-token"]}
+
+        # When
+        anonymous = await client.post(f"{API_PREFIX}/introspect", json=body)
+        wrong = await client.post(
+            f"{API_PREFIX}/introspect", json=body, headers={"Authorization": "Bearer other-secret"}
+        )
+        authorized = await client.post(
+            f"{API_PREFIX}/introspect", json=body, headers={"Authorization": "Bearer gateway-secret"}
+        )
+
+        # Then
+        assert anonymous.status_code == 401
+        assert wrong.status_code == 401
+        assert authorized.status_code == 200
+        assert authorized.json() == {"results": [{"active": False}]}
+
+
+class TestEpochRevocation:
+    async def test_logout_revokes_epoch_tokens_without_access_token_rows(
+        self, client: AsyncClient, session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        monkeypatch.setattr(auth_router.auth_service, "access_token_revocation", "epoch")
+        monkeypatch.setattr(auth_router.auth_service, "token_cache", cache)
+        user_data = await register_and_login(client)
+        headers = {"Authorization": f"Bearer {user_data['access_token']}"}
+        claims = jwt.get_unverified_claims(user_data["access_token"])
+        token_types = (
+            await session.scalars(select(Token.token_type).where(Token.user_id == UUID(claims["sub"])))
+        ).all()
+        me_responses = [await client.get(f"{API_PREFIX}/me", headers=headers) for _ in range(2)]
+        cache_hits = cache.stats()["hits"]
+
+        # When
+        await client.post(f"{API_PREFIX}/logout", headers=headers)
+        response = await client.get(f"{API_PREFIX}/me", headers=headers)
+
+        # Then
+        assert claims["epoch"] == 0
+        assert token_types == [TokenType.REFRESH, TokenType.REFRESH]
+        assert [me_response.status_code for me_response in me_responses] == [200, 200]
+        assert cache_hits == 1
+        assert response.status_code == 401
+        refresh_response = await client.get(
+            f"{API_PREFIX}/refresh", headers={"Authorization": f"Bearer {user_data['refresh_token']}"}
+        )
+        assert refresh_response.status_code == 401
+
+    async def test_row_tokens_stay_valid_in_epoch_mode(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        user_data = await register_and_login(client)
+        monkeypatch.setattr(auth_router.auth_service, "access_token_revocation", "epoch")
+
+        # When
+        response = await client.get(
+            f"{API_PREFIX}/me", headers={"Authorization": f"Bearer {user_data['access_token']}"}
+        )
+
+        # Then
+        assert response.status_code == 200
+
+    async def test_introspect_checks_epoch_tokens_against_user(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        monkeypatch.setattr(auth_router.auth_service, "access_token_revocation", "epoch")
+        user_data = await register_and_login(client)
+        revoked_data = await register_and_login(client)
+        await client.post(f"{API_PREFIX}/logout", headers={"Authorization": f"Bearer {revoked_data['access_token']}"})
+        tokens = [user_data["access_token"], revoked_data["access_token"], user_data["refresh_token"]]
+
+        # When
+        response = await client.post(f"{API_PREFIX}/introspect", json={"tokens": tokens})
+
+        # Then
+        results = response.json()["results"]
+        assert [result["active"] for result in results] == [True, False, True]
+        assert results[0]["username"] == user_data["username"]
+
+
 class TestClean:
     async def test_clean_without_auth_returns_401(self, client: AsyncClient) -> None:
         # Given
@@ -345,6 +609,18 @@ class TestClean:
         assert response.status_code == 200
 
 
+@pytest.fixture
+def frozen_rate_limit_clock(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stop the clock of the in-memory rate limit storage halfway through a one minute window.
+
+    The sliding window counter weighs the previous window by the time left in it, so requests
+    straddling a window boundary would be let through one over the limit.
+    """
+    now = (time.time() // 60) * 60 + 30
+    monkeypatch.setattr(limits.storage.memory, "time", SimpleNamespace(time=lambda: now))
+
+
+@pytest.mark.usefixtures("frozen_rate_limit_clock")
 class TestRateLimit:
     async def test_login_rate_limit(self, client: AsyncClient) -> None:
         # Given
@@ -384,3 +660,35 @@ class TestRateLimit:
 
         # Then
         assert responses[-1].status_code == 429
+
+    async def test_postgres_storage_is_checked_off_the_event_loop(
+        self, client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        monkeypatch.setattr(settings, "RATE_LIMIT_STORAGE", "postgres")
+        check_request_limit = rate_limit.limiter._check_request_limit
+        threads = []
+
+        def recording_check(*args: Any) -> None:
+            threads.append(threading.current_thread())
+            check_request_limit(*args)
+
+        monkeypatch.setattr(rate_limit.limiter, "_check_request_limit", recording_check)
+
+        # When
+        responses = []
+        for _ in range(4):
+            response = await client.post(
+                f"{API_PREFIX}/register",
+                json={
+                    "email": fake.email(),
+                    "username": fake.user_name(),
+                    "password": fake.password(length=12),
+                },
+            )
+            responses.append(response)
+
+        # Then
+        assert [response.status_code for response in responses] == [201, 201, 201, 429]
+        assert len(threads) == 4
+        assert threading.main_thread() not in threads
@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from fastauth.cli import _prepare_metrics_dir, build_parser, cpu_quota, parse_import_times, split_pool_budget
+
+
+class TestSplitPoolBudget:
+    def test_splits_budget_without_overflow(self) -> None:
+        # When
+        pool_size, max_overflow = split_pool_budget(budget=50, workers=4)
+
+        # Then
+        assert (pool_size, max_overflow) == (12, 0)
+        assert pool_size * 4 <= 50
+
+    def test_leaves_reserved_connections_out_of_the_pool(self) -> None:
+        # When
+        pool_size, max_overflow = split_pool_budget(budget=50, workers=4, reserved=1)
+
+        # Then
+        assert (pool_size, max_overflow) == (11, 0)
+        assert (pool_size + 1) * 4 <= 50
+
+    def test_rejects_budget_below_one_connection_per_worker(self) -> None:
+        # When / Then
+        with pytest.raises(ValueError):
+            split_pool_budget(budget=3, workers=4)
+
+
+class TestCpuQuota:
+    def test_rounds_the_quota_down_to_whole_cpus(self, tmp_path: Path) -> None:
+        # Given
+        (tmp_path / "cpu.max").write_text("250000 100000\n")
+
+        # When
+        cpus = cpu_quota(str(tmp_path))
+
+        # Then
+        assert cpus == 2
+
+    def test_no_quota(self, tmp_path: Path) -> None:
+        # Given
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+
+        # When
+        cpus = cpu_quota(str(tmp_path))
+
+        # Then
+        assert cpus is None
+        assert cpu_quota(str(tmp_path / "missing")) is None
+
+
+class TestServeParser:
+    def test_defaults_to_settings(self) -> None:
+        # When
+        args = build_parser().parse_args(["serve", "--workers", "2", "--db-connection-budget", "20"])
+
+        # Then
+        assert args.workers == 2
+        assert args.db_connection_budget == 20
+        assert args.host == "127.0.0.1"
+        assert args.port == 8000
+
+
+class TestPrepareMetricsDir:
+    def test_empties_the_configured_directory(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        (tmp_path / "counter_1.db").write_bytes(b"stale")
+
+        # When
+        path, created = _prepare_metrics_dir()
+
+        # Then
+        assert (path, created) == (str(tmp_path), False)
+        assert os.listdir(tmp_path) == []
+
+
+class TestParseImportTimes:
+    def test_reports_direct_imports_of_module(self) -> None:
+        # Given
+        output = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       100 |        100 | encodings",
+                "import time:       200 |        200 |     fastapi.routing",
+                "import time:       300 |        500 |   fastapi",
+                "import time:        50 |         50 |   fastauth.db",
+                "import time:        10 |        560 | fastauth.main",
+            ]
+        )
+
+        # When
+        total, imports = parse_import_times(output, "fastauth.main")
+
+        # Then
+        assert total == 0.00056
+        assert imports == [("fastapi", 0.0005), ("fastauth.db", 0.00005)]
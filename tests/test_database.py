@@ -0,0 +1,147 @@
+from collections.abc import AsyncGenerator
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import SQLModel, col, select, update
+
+from fastauth.common.settings import settings
+from fastauth.db import TokenRepository, UserRepository
+from fastauth.db.database import _connect_args, get_async_session_factory, reads_from_replica
+from fastauth.models import Token, User
+from fastauth.models.token import TokenType
+
+
+class TestConnectArgs:
+    def test_pooler_mode_disables_statement_cache(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        monkeypatch.setattr(settings, "DB_CONNECTION_MODE", "pooler")
+
+        # When
+        connect_args = _connect_args()
+
+        # Then
+        assert connect_args["statement_cache_size"] == 0
+        assert "prepared_statement_name_func" in connect_args
+
+    def test_direct_mode_caches_prepared_statements(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        monkeypatch.setattr(settings, "DB_CONNECTION_MODE", "direct")
+        monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 256)
+
+        # When
+        connect_args = _connect_args()
+
+        # Then
+        assert connect_args["statement_cache_size"] == 256
+        assert connect_args["prepared_statement_cache_size"] == 256
+        assert "prepared_statement_name_func" not in connect_args
+
+
+@pytest.fixture
+async def replicated(tmp_path: Path) -> AsyncGenerator[tuple[AsyncEngine, AsyncEngine], None]:
+    """Two SQLite databases standing in for a primary and its replica, replication left to the test."""
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+
+    yield primary, replica
+
+    await primary.dispose()
+    await replica.dispose()
+
+
+async def insert_user(engine: AsyncEngine, username: str) -> User:
+    user = User(email=f"{username}@example.com", username=username, hashed_password="hash")
+    async with get_async_session_factory(engine)() as session:
+        session.add(user)
+        await session.commit()
+
+    return user
+
+
+class TestRoutingSession:
+    async def test_reads_go_to_replica_and_writes_to_primary(self, replicated: tuple[AsyncEngine, AsyncEngine]) -> None:
+        # Given
+        primary, replica = replicated
+        await insert_user(replica, "replicated")
+        session_factory = get_async_session_factory(primary, replica)
+
+        # When
+        async with session_factory() as session:
+            read = await UserRepository().get_or_none(session, username="replicated")
+            await UserRepository().create(
+                session, User(email="written@example.com", username="written", hashed_password="hash")
+            )
+            await session.commit()
+
+        # Then
+        assert read is not None
+        async with get_async_session_factory(primary)() as session:
+            assert await UserRepository().get_or_none(session, username="written") is not None
+            assert await UserRepository().get_or_none(session, username="replicated") is None
+
+    async def test_reads_after_a_write_go_to_primary(self, replicated: tuple[AsyncEngine, AsyncEngine]) -> None:
+        # Given
+        primary, replica = replicated
+        await insert_user(replica, "stale")
+        session_factory = get_async_session_factory(primary, replica)
+
+        # When
+        async with session_factory() as session:
+            await UserRepository().create(
+                session, User(email="written@example.com", username="written", hashed_password="hash")
+            )
+            read_own_write = await UserRepository().get_or_none(session, username="written")
+            read_stale = await UserRepository().get_or_none(session, username="stale")
+
+        # Then
+        assert read_own_write is not None
+        assert read_stale is None
+
+    async def test_replica_miss_is_retried_on_primary(self, replicated: tuple[AsyncEngine, AsyncEngine]) -> None:
+        # Given
+        primary, replica = replicated
+        user = await insert_user(primary, "lagging")
+        await insert_user(replica, "replicated")
+        token = "lagging-token"
+        async with get_async_session_factory(primary)() as session:
+            session.add(
+                Token(
+                    token_hash=Token.hash_token(token),
+                    token_type=TokenType.ACCESS,
+                    expires_at=datetime.now(UTC) + timedelta(minutes=5),
+                    user_id=user.id,
+                )
+            )
+            await session.commit()
+        session_factory = get_async_session_factory(primary, replica)
+
+        # When
+        async with session_factory() as session:
+            lagging = await UserRepository().get_or_none(session, username="lagging")
+            live = await TokenRepository().get_live_with_users(session, [Token.hash_token(token)])
+            replicated_user = await UserRepository().get_or_none(session, username="replicated")
+
+        # Then
+        assert lagging is not None
+        assert live[Token.hash_token(token)][1].id == user.id
+        assert replicated_user is not None
+
+    async def test_data_modifying_cte_goes_to_primary(self, replicated: tuple[AsyncEngine, AsyncEngine]) -> None:
+        # Given
+        primary, replica = replicated
+        revoked = update(Token).values(revoked=True).returning(col(Token.user_id)).cte("revoked")
+        statement = select(User).join(revoked, col(User.id) == revoked.c.user_id)
+
+        # When
+        async with get_async_session_factory(primary, replica)() as session:
+            bind = session.sync_session.get_bind(clause=statement)
+            reads_replica = reads_from_replica(session)
+
+        # Then
+        assert bind is primary.sync_engine
+        assert not reads_replica
@@ -1,4 +1,12 @@
+from pathlib import Path
+
 from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from fastauth.common.settings import settings
+from fastauth.db.database import InstrumentedAsyncQueuePool, get_async_session, get_async_session_factory
+from fastauth.main import app
 
 
 class TestRoot:
@@ -10,3 +18,67 @@ class TestRoot:
         # Then
         assert response.status_code == 200
         assert response.json() == {"message": "Server is running"}
+
+
+class TestStats:
+    async def test_stats_reports_pool_checkouts(self, client: AsyncClient, tmp_path: Path) -> None:
+        # Given
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'stats.db'}",
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=2,
+        )
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        app.state.async_engine = engine
+
+        # When
+        response = await client.get("/stats")
+
+        # Then
+        del app.state.async_engine
+        await engine.dispose()
+        assert response.status_code == 200
+        pool = response.json()["pool"]
+        assert pool["size"] == 2
+        assert pool["checked_out"] == 0
+        assert pool["checkouts"] == 1
+        assert pool["checkout_wait_max_seconds"] >= 0
+
+    async def test_stats_reports_import_time(self, client: AsyncClient) -> None:
+        # Given
+        # When
+        response = await client.get("/stats")
+
+        # Then
+        assert response.json()["startup"]["import_seconds"] > 0
+
+
+class TestGoogleRoutes:
+    async def test_google_routes_are_not_mounted_without_client_id(self, client: AsyncClient) -> None:
+        # Given
+        assert settings.GOOGLE_CLIENT_ID is None
+
+        # When
+        response = await client.get(f"{settings.API_PREFIX}/auth/google/login")
+
+        # Then
+        assert response.status_code == 404
+
+
+class TestSessionDependency:
+    async def test_http_errors_are_not_turned_into_database_errors(
+        self, client: AsyncClient, engine: AsyncEngine
+    ) -> None:
+        # Given
+        app.dependency_overrides.pop(get_async_session)
+        app.state.async_session_factory = get_async_session_factory(engine)
+
+        # When
+        response = await client.post(
+            f"{settings.API_PREFIX}/auth/login", data={"username": "nobody", "password": "password123"}
+        )
+
+        # Then
+        del app.state.async_session_factory
+        assert response.status_code == 401
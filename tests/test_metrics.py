@@ -0,0 +1,95 @@
+import os
+from pathlib import Path
+
+import pytest
+from faker import Faker
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from prometheus_client import CollectorRegistry
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from fastauth.common.metrics import Metrics, MetricsMiddleware
+from fastauth.db import UserRepository
+
+fake = Faker()
+
+
+class TestMetrics:
+    async def test_request_latency_is_labelled_by_route_template(self) -> None:
+        # Given
+        metrics = Metrics(registry=CollectorRegistry())
+        app = FastAPI()
+        app.add_middleware(MetricsMiddleware, metrics=metrics)  # ty: ignore[invalid-argument-type]
+
+        @app.get("/items/{item_id}")
+        def read_item(item_id: int) -> dict[str, int]:
+            return {"item_id": item_id}
+
+        # When
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/items/1")
+            await client.get("/items/2")
+            await client.get("/missing")
+            await client.request("PURGE", "/items/3")
+
+        # Then
+        assert metrics.registry is not None
+        labels = {"method": "GET", "route": "/items/{item_id}"}
+        assert metrics.registry.get_sample_value("fastauth_http_request_duration_seconds_count", labels) == 2
+        labels = {"method": "GET", "route": "unmatched"}
+        assert metrics.registry.get_sample_value("fastauth_http_request_duration_seconds_count", labels) == 1
+        labels = {"method": "OTHER", "route": "/items/{item_id}"}
+        assert metrics.registry.get_sample_value("fastauth_http_request_duration_seconds_count", labels) == 1
+
+    async def test_repository_round_trips_are_counted(self, engine: AsyncEngine, session: AsyncSession) -> None:
+        # Given
+        metrics = Metrics(registry=CollectorRegistry())
+        metrics.watch_engine(engine, pool_status=lambda: {"size": 5, "checked_out": 1, "overflow": -4})
+        get_or_none = metrics.repository_method(UserRepository.get_or_none)
+
+        # When
+        await get_or_none(UserRepository(), session, username=fake.user_name())
+
+        # Then
+        assert metrics.registry is not None
+        labels = {"repository": "UserRepository", "method": "get_or_none"}
+        assert metrics.registry.get_sample_value("fastauth_repository_round_trips_total", labels) == 1
+        assert metrics.registry.get_sample_value("fastauth_repository_duration_seconds_count", labels) == 1
+        assert metrics.registry.get_sample_value("fastauth_db_pool_checked_out", {"pool": "primary"}) == 1
+
+    async def test_pool_gauges_are_labelled_by_pool(self, engine: AsyncEngine) -> None:
+        # Given
+        metrics = Metrics(registry=CollectorRegistry())
+
+        # When
+        metrics.watch_engine(engine, pool_status=lambda: {"size": 5, "checked_out": 1, "overflow": -4})
+        metrics.watch_engine(engine, pool_status=lambda: {"size": 5, "checked_out": 3, "overflow": -2}, pool="replica")
+
+        # Then
+        assert metrics.registry is not None
+        assert metrics.registry.get_sample_value("fastauth_db_pool_checked_out", {"pool": "primary"}) == 1
+        assert metrics.registry.get_sample_value("fastauth_db_pool_checked_out", {"pool": "replica"}) == 3
+        assert metrics.registry.get_sample_value("fastauth_db_pool_checkouts_total", {"pool": "primary"}) is None
+
+    async def test_metrics_endpoint_is_disabled_by_default(self, client: AsyncClient) -> None:
+        # Given
+        # When
+        response = await client.get("/metrics")
+
+        # Then
+        assert response.status_code == 404
+
+    async def test_multiprocess_scrape_labels_pool_gauges_with_worker_pid(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+        metrics = Metrics(registry=CollectorRegistry())
+        metrics.pool_collector.pools["primary"] = lambda: {"size": 5, "checked_out": 1, "overflow": -4}
+
+        # When
+        content, _ = metrics.render()
+
+        # Then
+        assert f'fastauth_db_pool_checked_out{{pid="{os.getpid()}",pool="primary"}} 1.0' in content.decode()
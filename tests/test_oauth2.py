@@ -0,0 +1,78 @@
+from collections import Counter
+
+import httpx
+from authlib.integrations.starlette_client import OAuth
+from fastapi import FastAPI
+
+from fastauth.services.oauth2 import OpenIDMetadataRefresher, SharedTransport
+
+PROVIDER = "http://provider.test"
+
+
+def build_stub_provider(hits: Counter[str]) -> FastAPI:
+    provider = FastAPI()
+
+    @provider.get("/.well-known/openid-configuration")
+    def read_configuration() -> dict[str, str]:
+        hits["configuration"] += 1
+        return {
+            "issuer": PROVIDER,
+            "authorization_endpoint": f"{PROVIDER}/authorize",
+            "token_endpoint": f"{PROVIDER}/token",
+            "jwks_uri": f"{PROVIDER}/jwks",
+        }
+
+    @provider.get("/jwks")
+    def read_jwks() -> dict[str, list]:
+        hits["jwks"] += 1
+        return {"keys": []}
+
+    @provider.post("/token")
+    def create_token() -> dict[str, str]:
+        hits["token"] += 1
+        return {"access_token": "access", "token_type": "Bearer"}
+
+    return provider
+
+
+class RecordingTransport(httpx.ASGITransport):
+    closed = False
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class TestOpenIDMetadataRefresher:
+    async def test_flows_reuse_cached_metadata_and_shared_transport(self) -> None:
+        # Given
+        hits: Counter[str] = Counter()
+        inner_transport = RecordingTransport(app=build_stub_provider(hits))
+        transport = SharedTransport(inner_transport)
+        oauth = OAuth()
+        client = oauth.register(
+            name="stub",
+            client_id="client",
+            client_secret="secret",
+            server_metadata_url=f"{PROVIDER}/.well-known/openid-configuration",
+            client_kwargs={"transport": transport},
+        )
+        refresher = OpenIDMetadataRefresher(
+            client=client,
+            metadata_url=f"{PROVIDER}/.well-known/openid-configuration",
+            transport=transport,
+            interval=3600,
+        )
+
+        # When
+        await refresher.run_once()
+        for _ in range(2):
+            await client.create_authorization_url(redirect_uri="http://fastauth.test/callback")
+            await client.fetch_access_token(redirect_uri="http://fastauth.test/callback", code="code")
+            await client.fetch_jwk_set()
+
+        # Then
+        assert hits == {"configuration": 1, "jwks": 1, "token": 2}
+        assert refresher.loaded_at is not None
+        assert not inner_transport.closed
+        await transport.shutdown()
+        assert inner_transport.closed
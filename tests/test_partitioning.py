@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from fastauth.db.partitioning import (
+    TokenPartitionMaintainer,
+    create_partition_sql,
+    partitions_to_create,
+    partitions_to_drop,
+)
+
+
+class LockNotAvailable(Exception):
+    sqlstate = "55P03"
+
+
+def maintainer_timing_out(
+    engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch, current_partition_exists: bool
+) -> TokenPartitionMaintainer:
+    maintainer = TokenPartitionMaintainer(
+        engine=engine, interval=3600, partition_interval="daily", horizon=timedelta(days=7)
+    )
+
+    async def run_once() -> dict[str, list[str]]:
+        raise DBAPIError("CREATE TABLE tokens_p20261025 PARTITION OF tokens", None, LockNotAvailable())
+
+    async def partition_exists() -> bool:
+        return current_partition_exists
+
+    monkeypatch.setattr(maintainer, "run_once", run_once)
+    monkeypatch.setattr(maintainer, "current_partition_exists", partition_exists)
+    return maintainer
+
+
+class TestPartitioning:
+    def test_daily_partitions_cover_the_horizon(self) -> None:
+        # Given
+        today = date(2026, 10, 18)
+
+        # When
+        starts = partitions_to_create(today, timedelta(days=2), "daily")
+
+        # Then
+        assert starts == [date(2026, 10, 18), date(2026, 10, 19), date(2026, 10, 20)]
+
+    def test_weekly_partitions_start_on_monday(self) -> None:
+        # Given
+        today = date(2026, 10, 18)
+
+        # When
+        starts = partitions_to_create(today, timedelta(days=7), "weekly")
+
+        # Then
+        assert starts == [date(2026, 10, 12), date(2026, 10, 19)]
+
+    def test_only_fully_expired_partitions_are_dropped(self) -> None:
+        # Given
+        names = ["tokens_p20261012", "tokens_p20261005", "tokens_p20261019", "tokens_legacy"]
+
+        # When
+        dropped = partitions_to_drop(names, date(2026, 10, 19), "weekly")
+
+        # Then
+        assert dropped == ["tokens_p20261005", "tokens_p20261012"]
+
+    def test_create_partition_sql_uses_utc_bounds(self) -> None:
+        # Given
+        start = date(2026, 10, 18)
+
+        # When
+        sql = create_partition_sql(start, "daily")
+
+        # Then
+        assert sql == (
+            "CREATE TABLE IF NOT EXISTS tokens_p20261018 PARTITION OF tokens "
+            "FOR VALUES FROM ('2026-10-18 00:00:00+00:00') TO ('2026-10-19 00:00:00+00:00')"
+        )
+
+    async def test_startup_tolerates_lock_timeout_when_current_partition_exists(
+        self, engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        maintainer = maintainer_timing_out(engine, monkeypatch, current_partition_exists=True)
+
+        # When
+        await maintainer.run_at_startup()
+
+        # Then
+        assert maintainer.last_run_created == []
+
+    async def test_startup_fails_on_lock_timeout_when_current_partition_is_missing(
+        self, engine: AsyncEngine, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Given
+        maintainer = maintainer_timing_out(engine, monkeypatch, current_partition_exists=False)
+
+        # When
+        # Then
+        with pytest.raises(DBAPIError):
+            await maintainer.run_at_startup()
@@ -0,0 +1,76 @@
+import pytest
+
+from fastauth.services.password import MIN_COST, UNUSABLE_PASSWORD, PasswordHasher, build_context, calibrate_cost
+
+
+class TestPasswordHasher:
+    async def test_verify_and_update_rehashes_below_current_cost(self) -> None:
+        # Given
+        hashed_password = build_context("bcrypt", cost=4).hash("password123")
+        hasher = PasswordHasher(context=build_context("bcrypt", cost=5))
+
+        # When
+        verified, new_hash = await hasher.verify_and_update("password123", hashed_password)
+
+        # Then
+        hasher.shutdown()
+        assert verified is True
+        assert new_hash is not None
+        assert new_hash.startswith("$2b$05$")
+
+    async def test_verify_and_update_keeps_current_hash(self) -> None:
+        # Given
+        context = build_context("bcrypt", cost=4)
+        hasher = PasswordHasher(context=context)
+
+        # When
+        verified, new_hash = await hasher.verify_and_update("password123", context.hash("password123"))
+
+        # Then
+        hasher.shutdown()
+        assert verified is True
+        assert new_hash is None
+
+    async def test_unusable_password_never_verifies(self) -> None:
+        # Given
+        hasher = PasswordHasher(context=build_context("bcrypt", cost=4), max_workers=0, queue_size=0)
+
+        # When
+        verified, new_hash = await hasher.verify_and_update(UNUSABLE_PASSWORD, UNUSABLE_PASSWORD)
+
+        # Then
+        assert verified is False
+        assert new_hash is None
+        assert await hasher.verify("", UNUSABLE_PASSWORD) is False
+
+    def test_argon2_context_rehashes_bcrypt_hashes(self) -> None:
+        # Given
+        pytest.importorskip("argon2")
+        context = build_context("argon2", cost=1, argon2_memory_cost=1024)
+        hashed_password = build_context("bcrypt", cost=4).hash("password123")
+
+        # When
+        verified, new_hash = context.verify_and_update("password123", hashed_password)
+
+        # Then
+        assert verified is True
+        assert new_hash is not None
+        assert new_hash.startswith("$argon2id$v=19$m=1024,t=1,p=1$")
+
+
+class TestCalibrateCost:
+    def test_never_goes_below_minimum_cost(self) -> None:
+        # Given
+        # When
+        cost = calibrate_cost("bcrypt", target=0)
+
+        # Then
+        assert cost == MIN_COST["bcrypt"]
+
+    def test_password_hash_cost_lowers_the_minimum(self) -> None:
+        # Given
+        # When
+        cost = calibrate_cost("bcrypt", target=0, min_cost=4)
+
+        # Then
+        assert cost == 4
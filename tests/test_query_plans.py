@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from faker import Faker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from conftest import QueryPlans
+from fastauth.db import TokenRepository, UserRepository
+from fastauth.models import Token, User
+from fastauth.services.password import UNUSABLE_PASSWORD
+
+from test_repository import create_refresh_token
+
+fake = Faker()
+
+
+class TestQueryPlans:
+    async def test_user_repository_queries_use_indexes(self, session: AsyncSession, query_plans: QueryPlans) -> None:
+        # Given
+        repository = UserRepository()
+        user = await repository.create(
+            session, User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        )
+
+        # When
+        await repository.get_or_none(session, id=user.id)
+        await repository.get_or_none(session, username=user.username)
+        await repository.get_or_none(session, email=user.email)
+        await repository.get_or_none(session, oauth_provider="google", oauth_id=fake.uuid4())
+        await repository.update(session, user.id, username=fake.user_name())
+        await repository.get_by_ids(session, [user.id])
+        await repository.bump_token_epoch(session, user.id)
+        await repository.upsert_oauth_user(
+            session,
+            User(
+                email=user.email,
+                username=fake.user_name(),
+                hashed_password=UNUSABLE_PASSWORD,
+                oauth_provider="google",
+                oauth_id=fake.uuid4(),
+            ),
+        )
+        await repository.delete(session, user.id)
+
+        # Then
+        assert await query_plans.full_scans(session) == []
+
+    async def test_token_repository_queries_use_indexes(self, session: AsyncSession, query_plans: QueryPlans) -> None:
+        # Given
+        repository = TokenRepository()
+        user, token = await create_refresh_token(session, expires_in=timedelta(days=1))
+
+        # When
+        await repository.get_by_token(session, token, user_id=user.id)
+        await repository.get_live_with_users(session, [Token.hash_token(token)])
+        await repository.rotate_refresh_token(session, token)
+        await repository.revoke_all_for_user(session, user.id)
+        await repository.delete_expired(session)
+        await repository.delete_expired_batch(session, batch_size=10)
+        await repository.delete_expired_batch(session, batch_size=10, include_expired=False)
+
+        # Then
+        assert await query_plans.full_scans(session) == []
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+from collections.abc import Generator
+from uuid import uuid4
+
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from fastauth.common.rate_limit_storage import SharedMemoryStorage
+
+
+@pytest.fixture
+def shm_uri() -> Generator[str, None, None]:
+    uri = f"fastauth+shm://fastauth-test-{uuid4().hex[:8]}?slots=64"
+    yield uri
+    storage = storage_from_string(uri)
+    assert isinstance(storage, SharedMemoryStorage)
+    storage.unlink()
+
+
+def _hit_many(uri: str, hits: int, results: "multiprocessing.Queue[int]") -> None:
+    limiter = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse("10/minute")
+    results.put(sum(limiter.hit(item, "127.0.0.1") for _ in range(hits)))
+
+
+class TestSharedMemoryStorage:
+    def test_limit_is_enforced(self, shm_uri: str) -> None:
+        # Given
+        limiter = SlidingWindowCounterRateLimiter(storage_from_string(shm_uri))
+        item = parse("3/minute")
+
+        # When
+        hits = [limiter.hit(item, "127.0.0.1") for _ in range(4)]
+
+        # Then
+        assert hits == [True, True, True, False]
+        assert limiter.hit(item, "10.0.0.1") is True
+
+    def test_window_stats_report_remaining_hits(self, shm_uri: str) -> None:
+        # Given
+        limiter = SlidingWindowCounterRateLimiter(storage_from_string(shm_uri))
+        item = parse("5/minute")
+        limiter.hit(item, "127.0.0.1")
+        limiter.hit(item, "127.0.0.1")
+
+        # When
+        stats = limiter.get_window_stats(item, "127.0.0.1")
+
+        # Then
+        assert stats.remaining == 3
+
+    def test_clear_resets_the_key(self, shm_uri: str) -> None:
+        # Given
+        limiter = SlidingWindowCounterRateLimiter(storage_from_string(shm_uri))
+        item = parse("1/minute")
+        limiter.hit(item, "127.0.0.1")
+
+        # When
+        limiter.clear(item, "127.0.0.1")
+
+        # Then
+        assert limiter.hit(item, "127.0.0.1") is True
+
+    def test_counters_are_shared_across_processes(self, shm_uri: str) -> None:
+        # Given
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [context.Process(target=_hit_many, args=(shm_uri, 8, results)) for _ in range(3)]
+
+        # When
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=30)
+
+        # Then
+        assert sum(results.get(timeout=5) for _ in processes) == 10
+
+    def test_counters_are_exact_in_workers_forked_after_creation(self, shm_uri: str) -> None:
+        # Given
+        storage = storage_from_string(shm_uri)
+        storage.incr("key", expiry=10**9)
+        pids = []
+
+        # When
+        for _ in range(4):
+            pid = os.fork()
+            if pid == 0:
+                for _ in range(2000):
+                    storage.incr("key", expiry=10**9)
+                os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+
+        # Then
+        assert storage.get("key") == 8001
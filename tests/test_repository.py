@@ -0,0 +1,225 @@
+from datetime import UTC, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from faker import Faker
+from sqlalchemy.exc import NoResultFound
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from fastauth.db import TokenRepository, UserRepository
+from fastauth.models import Token, User
+from fastauth.models.token import TokenType
+from fastauth.services.password import UNUSABLE_PASSWORD
+
+fake = Faker()
+
+
+async def create_refresh_token(session: AsyncSession, expires_in: timedelta, revoked: bool = False) -> tuple[User, str]:
+    user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+    session.add(user)
+    await session.flush()
+
+    token = fake.sha256()
+    session.add(
+        Token(
+            token_hash=Token.hash_token(token),
+            token_type=TokenType.REFRESH,
+            expires_at=datetime.now(UTC) + expires_in,
+            revoked=revoked,
+            user_id=user.id,
+        )
+    )
+    await session.flush()
+
+    return user, token
+
+
+class TestGetOrNone:
+    async def test_statement_is_built_once_per_repository_and_keys(self, session: AsyncSession) -> None:
+        # Given
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+
+        # When
+        found_user = await UserRepository().get_or_none(session, username=user.username)
+
+        # Then
+        assert found_user is user
+        statement = UserRepository._get_or_none_statement(("id",))
+        assert UserRepository._get_or_none_statement(("id",)) is statement
+        assert TokenRepository._get_or_none_statement(("id",)) is not statement
+
+    async def test_none_matches_null_column(self, session: AsyncSession) -> None:
+        # Given
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+
+        # When
+        found_user = await UserRepository().get_or_none(session, username=user.username, oauth_id=None)
+
+        # Then
+        assert found_user is user
+        assert await UserRepository().get_or_none(session, username=user.username, oauth_id="google-id") is None
+
+
+class TestUpdate:
+    async def test_returns_updated_row_and_refreshes_session_instance(self, session: AsyncSession) -> None:
+        # Given
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+
+        # When
+        updated_user = await UserRepository().update(session, user.id, hashed_password="new-hash")
+
+        # Then
+        assert updated_user is user
+        assert user.hashed_password == "new-hash"
+
+    async def test_identity_map_update_returns_updated_row(self, session: AsyncSession) -> None:
+        # Given
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+
+        # When
+        updated_user = await UserRepository().update(session, user.id, use_identity_map=True, oauth_id="sub")
+
+        # Then
+        assert updated_user is user
+        assert user.oauth_id == "sub"
+
+    async def test_missing_row_raises(self, session: AsyncSession) -> None:
+        # Given
+        # When
+        # Then
+        with pytest.raises(NoResultFound):
+            await UserRepository().update(session, uuid4(), hashed_password="new-hash")
+
+
+class TestUpsertOAuthUser:
+    async def test_inserts_then_returns_linked_user(self, session: AsyncSession) -> None:
+        # Given
+        repository = UserRepository()
+        oauth_id = fake.uuid4()
+        user = User(
+            email=fake.email(),
+            username=fake.user_name(),
+            hashed_password=UNUSABLE_PASSWORD,
+            oauth_provider="google",
+            oauth_id=oauth_id,
+        )
+        inserted_user = await repository.upsert_oauth_user(session, user)
+
+        # When
+        linked_user = await repository.upsert_oauth_user(
+            session,
+            User(
+                email=fake.email(),
+                username=fake.user_name(),
+                hashed_password=UNUSABLE_PASSWORD,
+                oauth_provider="google",
+                oauth_id=oauth_id,
+            ),
+        )
+
+        # Then
+        assert linked_user.id == inserted_user.id
+        assert linked_user.email == user.email
+
+    async def test_links_existing_user_with_same_email(self, session: AsyncSession) -> None:
+        # Given
+        repository = UserRepository()
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        session.add(user)
+        await session.flush()
+
+        # When
+        linked_user = await repository.upsert_oauth_user(
+            session,
+            User(
+                email=user.email,
+                username=fake.user_name(),
+                hashed_password=UNUSABLE_PASSWORD,
+                oauth_provider="google",
+                oauth_id=fake.uuid4(),
+            ),
+        )
+
+        # Then
+        assert linked_user.id == user.id
+        assert linked_user.oauth_provider == "google"
+        assert linked_user.hashed_password == "hash"
+
+
+class TestBumpTokenEpoch:
+    async def test_increments_epoch_of_user_only(self, session: AsyncSession) -> None:
+        # Given
+        user, _ = await create_refresh_token(session, expires_in=timedelta(days=1))
+        other_user, _ = await create_refresh_token(session, expires_in=timedelta(days=1))
+        repository = UserRepository()
+
+        # When
+        await repository.bump_token_epoch(session, user.id)
+        await repository.bump_token_epoch(session, user.id)
+        users = await repository.get_by_ids(session, [user.id, other_user.id, uuid4()])
+
+        # Then
+        await session.refresh(user)
+        await session.refresh(other_user)
+        assert set(users) == {user.id, other_user.id}
+        assert user.token_epoch == 2
+        assert other_user.token_epoch == 0
+
+
+class TestGetLiveWithUsers:
+    async def test_returns_live_tokens_with_their_user(self, session: AsyncSession) -> None:
+        # Given
+        user, token = await create_refresh_token(session, expires_in=timedelta(days=1))
+        _, revoked_token = await create_refresh_token(session, expires_in=timedelta(days=1), revoked=True)
+        _, expired_token = await create_refresh_token(session, expires_in=-timedelta(days=1))
+        token_hashes = [Token.hash_token(item) for item in (token, revoked_token, expired_token, fake.sha256())]
+
+        # When
+        live = await TokenRepository().get_live_with_users(session, token_hashes)
+
+        # Then
+        assert list(live) == [Token.hash_token(token)]
+        assert live[Token.hash_token(token)][1] is user
+
+
+class TestRotateRefreshToken:
+    async def test_returns_user_and_revokes_token(self, session: AsyncSession) -> None:
+        # Given
+        repository = TokenRepository()
+        user, token = await create_refresh_token(session, expires_in=timedelta(days=1))
+
+        # When
+        rotated_user = await repository.rotate_refresh_token(session, token)
+
+        # Then
+        assert rotated_user is not None
+        assert rotated_user.id == user.id
+        assert await repository.rotate_refresh_token(session, token) is None
+
+    async def test_rejects_expired_token(self, session: AsyncSession) -> None:
+        # Given
+        _, token = await create_refresh_token(session, expires_in=timedelta(minutes=-1))
+
+        # When
+        rotated_user = await TokenRepository().rotate_refresh_token(session, token)
+
+        # Then
+        assert rotated_user is None
+
+    async def test_rejects_revoked_token(self, session: AsyncSession) -> None:
+        # Given
+        _, token = await create_refresh_token(session, expires_in=timedelta(days=1), revoked=True)
+
+        # When
+        rotated_user = await TokenRepository().rotate_refresh_token(session, token)
+
+        # Then
+        assert rotated_user is None
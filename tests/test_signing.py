@@ -0,0 +1,78 @@
+from pathlib import Path
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from httpx import AsyncClient
+from jose import JWTError, jwt
+
+from fastauth.services.signing import KeyRing
+
+
+def write_private_key(directory: Path, kid: str, key: ec.EllipticCurvePrivateKey | rsa.RSAPrivateKey) -> None:
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    (directory / f"{kid}.pem").write_bytes(pem)
+
+
+class TestKeyRing:
+    def test_rsa_tokens_carry_kid_and_verify_with_published_key_set(self, tmp_path: Path) -> None:
+        # Given
+        write_private_key(tmp_path, "2026-10", rsa.generate_private_key(public_exponent=65537, key_size=2048))
+        key_ring = KeyRing.from_directory(tmp_path, "RS256")
+
+        # When
+        token = key_ring.encode({"sub": "user"})
+
+        # Then
+        assert jwt.get_unverified_header(token)["kid"] == "2026-10"
+        assert key_ring.decode(token)["sub"] == "user"
+        assert jwt.decode(token, key_ring.jwks.decode(), algorithms=["RS256"])["sub"] == "user"
+
+    def test_tokens_of_previous_key_verify_after_rotation(self, tmp_path: Path) -> None:
+        # Given
+        write_private_key(tmp_path, "old", ec.generate_private_key(ec.SECP256R1()))
+        old_token = KeyRing.from_directory(tmp_path, "ES256").encode({"sub": "user"})
+        write_private_key(tmp_path, "new", ec.generate_private_key(ec.SECP256R1()))
+
+        # When
+        key_ring = KeyRing.from_directory(tmp_path, "ES256", signing_key_id="new")
+
+        # Then
+        assert key_ring.decode(old_token)["sub"] == "user"
+        assert jwt.get_unverified_header(key_ring.encode({"sub": "user"}))["kid"] == "new"
+
+    def test_unknown_kid_and_public_signing_key_are_rejected(self, tmp_path: Path) -> None:
+        # Given
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        foreign_directory = tmp_path / "foreign"
+        foreign_directory.mkdir()
+        write_private_key(foreign_directory, "foreign", private_key)
+        foreign_token = KeyRing.from_directory(foreign_directory, "ES256").encode({"sub": "user"})
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        (tmp_path / "retired.pem").write_bytes(public_pem)
+        write_private_key(tmp_path, "current", ec.generate_private_key(ec.SECP256R1()))
+
+        # When
+        key_ring = KeyRing.from_directory(tmp_path, "ES256", signing_key_id="current")
+
+        # Then
+        with pytest.raises(JWTError):
+            key_ring.decode(foreign_token)
+        with pytest.raises(ValueError):
+            KeyRing.from_directory(tmp_path, "ES256", signing_key_id="retired")
+        with pytest.raises(ValueError):
+            KeyRing.from_directory(tmp_path, "RS256", signing_key_id="current")
+
+
+class TestJwks:
+    async def test_jwks_is_empty_with_shared_secret(self, client: AsyncClient) -> None:
+        # Given
+        # When
+        response = await client.get("/.well-known/jwks.json")
+
+        # Then
+        assert response.status_code == 200
+        assert response.json() == {"keys": []}
+        assert "max-age" in response.headers["cache-control"]
@@ -0,0 +1,92 @@
+import time
+from uuid import uuid4
+
+import pytest
+from faker import Faker
+
+from fastauth.models.user import User
+from fastauth.services.token_cache import TokenCache
+
+fake = Faker()
+
+
+def make_user() -> User:
+    return User(id=uuid4(), email=fake.email(), username=fake.user_name(), hashed_password="hash")
+
+
+class TestTokenCache:
+    def test_get_returns_cached_user_snapshot(self) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        user = make_user()
+        cache.set("jti", user, expires_at=time.time() + 60)
+
+        # When
+        cached_user = cache.get("jti")
+
+        # Then
+        assert cached_user is not None
+        assert cached_user is not user
+        assert cached_user.id == user.id
+        assert cache.stats()["hits"] == 1
+
+    def test_entry_does_not_outlive_token_expiration(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        cache.set("jti", make_user(), expires_at=time.time() + 5)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+
+        # When
+        cached_user = cache.get("jti")
+
+        # Then
+        assert cached_user is None
+        assert cache.stats()["evictions"] == 1
+
+    def test_entry_does_not_outlive_max_ttl(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=1)
+        cache.set("jti", make_user(), expires_at=time.time() + 60)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now + 2)
+
+        # When
+        cached_user = cache.get("jti")
+
+        # Then
+        assert cached_user is None
+
+    def test_least_recently_used_entry_is_evicted(self) -> None:
+        # Given
+        cache = TokenCache(max_size=2, max_ttl=60)
+        expires_at = time.time() + 60
+        cache.set("first", make_user(), expires_at=expires_at)
+        cache.set("second", make_user(), expires_at=expires_at)
+        cache.get("first")
+
+        # When
+        cache.set("third", make_user(), expires_at=expires_at)
+
+        # Then
+        assert cache.get("second") is None
+        assert cache.get("first") is not None
+        assert cache.get("third") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_evict_user_removes_all_user_entries(self) -> None:
+        # Given
+        cache = TokenCache(max_size=10, max_ttl=60)
+        user = make_user()
+        other_user = make_user()
+        expires_at = time.time() + 60
+        cache.set("first", user, expires_at=expires_at)
+        cache.set("second", user, expires_at=expires_at)
+        cache.set("other", other_user, expires_at=expires_at)
+
+        # When
+        cache.evict_user(user.id)
+
+        # Then
+        assert len(cache) == 1
+        assert cache.get("other") is not None
@@ -0,0 +1,56 @@
+from datetime import UTC, datetime, timedelta
+
+from faker import Faker
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col, select
+
+from fastauth.db import TokenRepository, get_async_session_factory
+from fastauth.models import Token, User
+from fastauth.models.token import TokenType
+from fastauth.services.token_reaper import TokenReaper
+
+fake = Faker()
+
+
+def make_token(user: User, expires_at: datetime, revoked: bool = False) -> Token:
+    return Token(
+        token_hash=Token.hash_token(fake.uuid4()),
+        token_type=TokenType.ACCESS,
+        expires_at=expires_at,
+        revoked=revoked,
+        user_id=user.id,
+    )
+
+
+class TestTokenReaper:
+    async def test_run_once_removes_expired_and_revoked_tokens_in_batches(self, engine: AsyncEngine) -> None:
+        # Given
+        session_factory = get_async_session_factory(engine)
+        now = datetime.now(UTC)
+        user = User(email=fake.email(), username=fake.user_name(), hashed_password="hash")
+        expired_tokens = [make_token(user, now - timedelta(minutes=1)) for _ in range(4)]
+        revoked_token = make_token(user, now + timedelta(minutes=30), revoked=True)
+        valid_token = make_token(user, now + timedelta(minutes=30))
+        async with session_factory() as session:
+            session.add(user)
+            await session.flush()
+            session.add_all([*expired_tokens, revoked_token, valid_token])
+            await session.commit()
+
+        reaper = TokenReaper(
+            session_factory=session_factory,
+            token_repository=TokenRepository(),
+            interval=60,
+            batch_size=2,
+            batch_sleep=0,
+        )
+
+        # When
+        removed = await reaper.run_once()
+
+        # Then
+        async with session_factory() as session:
+            remaining = (await session.execute(select(Token).where(col(Token.user_id) == user.id))).scalars().all()
+        assert removed >= 5
+        assert [token.id for token in remaining] == [valid_token.id]
+        assert reaper.stats()["last_run_removed"] == removed
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+from fastauth.common.rate_limit import limiter
+from fastauth.db.database import InstrumentedAsyncQueuePool, get_pool_status
+from fastauth.main import app
+from fastauth.models.user import User
+from fastauth.services.password import PasswordHasher, build_context
+from fastauth.services.signing import key_ring
+from fastauth.services.warmup import exercise_routes, open_connections, prime_password_hashing, warm_up
+
+
+class TestWarmUp:
+    async def test_open_connections_keeps_them_in_pool(self, tmp_path: Path) -> None:
+        # Given
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}",
+            poolclass=InstrumentedAsyncQueuePool,
+            pool_size=3,
+        )
+
+        # When
+        opened = await open_connections(engine, count=5)
+
+        # Then
+        assert opened == 3
+        assert get_pool_status(engine)["checked_in"] == 3
+        await engine.dispose()
+
+    async def test_prime_password_hashing_starts_every_worker(self) -> None:
+        # Given
+        hasher = PasswordHasher(context=build_context("bcrypt", cost=4), max_workers=2)
+
+        # When
+        await prime_password_hashing(hasher)
+
+        # Then
+        assert isinstance(hasher._executor, ThreadPoolExecutor)
+        assert len(hasher._executor._threads) == 2
+        hasher.shutdown()
+
+    async def test_exercise_routes_writes_nothing_and_keeps_rate_limits(
+        self, client: AsyncClient, session: AsyncSession
+    ) -> None:
+        # Given
+        count_users = select(func.count()).select_from(User)
+        users_before = await session.scalar(count_users)
+
+        # When
+        statuses = await exercise_routes(app, key_ring)
+
+        # Then
+        assert await session.scalar(count_users) == users_before
+        assert all(status < 500 for status in statuses.values())
+        assert statuses["GET /api/v1/auth/me"] == 401
+        assert statuses["POST /api/v1/auth/login"] == 401
+        assert limiter.enabled
+
+    async def test_warm_up_succeeds(self, client: AsyncClient, engine: AsyncEngine) -> None:
+        # Given
+        # When
+        warmed_up = await warm_up(app, [engine], min_connections=1, timeout=30)
+
+        # Then
+        assert warmed_up
+
+
+class TestReady:
+    async def test_ready_only_after_startup(self, client: AsyncClient) -> None:
+        # Given
+        not_ready = await client.get("/ready")
+        app.state.ready = True
+        app.state.warmed_up = True
+
+        # When
+        response = await client.get("/ready")
+
+        # Then
+        app.state.ready = False
+        assert not_ready.status_code == 503
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready", "warmed_up": True}